@@ -1,10 +1,9 @@
 import json
+import threading
 from pathlib import Path
 
-import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-from ollama import chat  # pip install ollama
+import tracing
+from context_packer import block_header, estimate_tokens, pack_context
 
 CONFIG_PATH = Path(__file__).parent / "config.json"
 with open(CONFIG_PATH, "r", encoding="utf-8") as f:
@@ -12,39 +11,140 @@ with open(CONFIG_PATH, "r", encoding="utf-8") as f:
 
 MODEL_NAME = config["model_name"]
 TOP_K = int(config["top_k"])
+CONTEXT_TOKEN_BUDGET = int(config.get("context_token_budget", 2000))
+CHUNK_STRIDE = int(config["chunk_size"]) - int(config["chunk_overlap"])
 
-DB_DIR = Path(__file__).parent / "faiss_db"
-INDEX_PATH = DB_DIR / "repo.index"
-DOCS_PATH = DB_DIR / "docs.json"
+tracing.configure(config)
 
-index = faiss.read_index(str(INDEX_PATH))
+# faiss, torch/onnxruntime and ollama are slow to import, so nothing heavy is loaded
+# at import time; search state is built on first use or by warm_up_in_background()
+shards = None
+embed_model = None
+reranker = None
+_reranker_loaded = False
+answer_cache = None
+_answer_cache_loaded = False
+_load_lock = threading.Lock()
 
-with open(DOCS_PATH, "r", encoding="utf-8") as f:
-    docs = json.load(f)
 
-embed_model = SentenceTransformer(r"C:\all-MiniLM-L6-v2")  # loading embeddings
+def chat(**kwargs):
+    from ollama import chat as ollama_chat  # pip install ollama
 
+    with tracing.span("llm.chat", model=kwargs.get("model"), messages=len(kwargs.get("messages", [])),
+                      prompt_chars=sum(len(str(m.get("content", ""))) for m in kwargs.get("messages", []))) as s:
+        response = ollama_chat(**kwargs)
+        s.set(**tracing.token_usage(response))
+    return response
 
-def retrieve_chunks(query: str, top_k: int = TOP_K):
-    q_emb = embed_model.encode([query], normalize_embeddings=True)
-    q_emb = np.array(q_emb, dtype="float32")
 
-    scores, idxs = index.search(q_emb, top_k)
+def load_shards():
+    global shards
+    if shards is None:
+        from sharding import load_shards as load_built_shards
+
+        shards = load_built_shards(config, rescore_factor=int(config.get("rescore_factor", 4)))
+    return shards
+
+
+def load_embed_model():
+    global embed_model
+    if embed_model is None:
+        from embeddings import load_encoder
+
+        embed_model = load_encoder(config)  # loading embeddings
+        for shard in load_shards():
+            if shard.manifest.get("embed_backend", "torch") != config.get("embed_backend", "torch"):
+                print(f"Warning: shard '{shard.name}' was built with a different embed_backend, "
+                      f"re-run index_repo.py --shard {shard.name} for best recall")
+    return embed_model
+
+
+def load_reranker():
+    global reranker, _reranker_loaded
+    if not _reranker_loaded:  # None is a valid result when use_reranker is off
+        from reranker import load_reranker as load_configured_reranker
+
+        reranker = load_configured_reranker(config)
+        _reranker_loaded = True
+    return reranker
+
+
+def load_answer_cache():
+    global answer_cache, _answer_cache_loaded
+    if not _answer_cache_loaded:
+        from answer_cache import load_answer_cache as load_configured_cache
+
+        answer_cache = load_configured_cache(config)
+        _answer_cache_loaded = True
+    return answer_cache
+
+
+def load_search_state():
+    with _load_lock:  # the warm-up thread and the first query may race here
+        return load_shards(), load_embed_model(), load_reranker()
+
+
+def _warm_up():
+    try:
+        load_search_state()
+        import ollama  # noqa: F401
+    except Exception as e:  # surfaced again, with a traceback, on the first real search
+        print(f"\n[assistant] Background warm-up failed: {e}")
+
+
+def warm_up_in_background():  # load while the user is still typing the first question
+    thread = threading.Thread(target=_warm_up, name="search-warm-up", daemon=True)
+    thread.start()
+    return thread
 
-    results = []
-    for i, score in zip(idxs[0].tolist(), scores[0].tolist()):
-        if i < 0 or i >= len(docs):
-            continue
-        item = docs[i]
-        results.append((item["text"], {"path": item["path"], "chunk_id": item["chunk_id"], "score": score}))
-    return results
+
+def retrieve_chunks(query: str, top_k: int = TOP_K, repo=None, path_prefix: str = None,
+                    file_glob: str = None, extensions=None, q_emb=None):
+    with tracing.span("retrieve", top_k=top_k, filtered=bool(repo or path_prefix or file_glob or extensions)) as s:
+        chunks = _retrieve_chunks(query, top_k, repo, path_prefix, file_glob, extensions, q_emb)
+        s.set(results=len(chunks))
+    return chunks
+
+
+def embed_query(query: str):
+    _, embed_model, _ = load_search_state()
+    with tracing.span("embed", backend=config.get("embed_backend", "torch")):
+        return embed_model.encode([query])
+
+
+def _retrieve_chunks(query: str, top_k: int, repo, path_prefix, file_glob, extensions, q_emb=None):
+    from sharding import search_shards
+
+    with tracing.span("load_search_state"):
+        shards, embed_model, reranker = load_search_state()
+    if not shards:
+        return []
+
+    if q_emb is None:  # callers that already embedded the query (answer cache) pass it in
+        q_emb = embed_query(query)
+
+    fetch = max(top_k, int(config.get("rerank_candidates", 20))) if reranker else top_k  # over-fetch for stage two
+    chunks = search_shards(shards, q_emb, fetch, repo=repo, path_prefix=path_prefix,  # merged top-k across shards
+                           file_glob=file_glob, extensions=extensions)
+
+    if reranker:
+        with tracing.span("rerank", candidates=len(chunks)):
+            chunks = reranker.rerank(query, chunks, top_k)
+    return chunks
 
 
 def build_prompt(question: str, chunks_with_meta):
-    context_parts = []
-    for chunk, meta in chunks_with_meta:
-        path = meta.get("path", "unknown")
-        context_parts.append(f"File: {path}\n{chunk}")
+    with tracing.span("prompt.build", chunks=len(chunks_with_meta)) as s:
+        system_msg, user_msg, blocks = _build_prompt(question, chunks_with_meta)
+        s.set(blocks=len(blocks), context_tokens=sum(estimate_tokens(b["text"]) for b in blocks),
+              prompt_chars=len(system_msg) + len(user_msg))
+    return system_msg, user_msg
+
+
+def _build_prompt(question: str, chunks_with_meta):
+    # overlapping neighbours are merged and the context is capped at context_token_budget
+    blocks = pack_context(chunks_with_meta, CONTEXT_TOKEN_BUDGET, CHUNK_STRIDE)
+    context_parts = [f"{block_header(b)}\n{b['text']}" for b in blocks]
 
     context_text = "\n\n---\n\n".join(context_parts)
 
@@ -60,17 +160,33 @@ def build_prompt(question: str, chunks_with_meta):
         f"Question: {question}"
     )
 
-    return system_msg, user_msg
+    return system_msg, user_msg, blocks
 
 
 def answer_question(question: str) -> str:
+    with tracing.span("turn", entry="answer_question"):
+        return _answer_question(question)
+
+
+def _answer_question(question: str) -> str:
+    cache = load_answer_cache()
+    q_emb = embed_query(question) if cache is not None else None  # shared by retrieval and the cache lookup
+
     print("[assistant] Retrieving chunks...")
-    chunks = retrieve_chunks(question, TOP_K)
+    chunks = retrieve_chunks(question, TOP_K, q_emb=q_emb)
     print(f"[assistant] Retrieved {len(chunks)} chunks")
 
     if not chunks:
         return "I couldn't find any relevant code in the index."
 
+    if cache is not None:  # a hit needs a similar question *and* the same retrieved chunk versions
+        with tracing.span("answer_cache.lookup") as s:
+            hit = cache.lookup(q_emb[0], chunks)
+            s.set(hit=hit is not None)
+        if hit:
+            print(f"[assistant] Answer cache hit (similar to: {hit['question'][:60]!r}, {hit['similarity']:.3f})")
+            return hit["answer"]
+
     system_msg, user_msg = build_prompt(question, chunks)
     print("[assistant] Calling model...")
 
@@ -83,10 +199,14 @@ def answer_question(question: str) -> str:
     )
 
     print("[assistant] Got response from model.")
-    return response["message"]["content"]
+    answer = response["message"]["content"]
+    if cache is not None:
+        cache.put(question, q_emb[0], chunks, answer)
+    return answer
 
 
 def main():
+    warm_up_in_background()
     print("Repo assistant (FAISS) ready. Type your question (or 'exit'):")
     while True:
         q = input("> ").strip()
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import tracing
+from embedding_cache import chunk_hash
+
+
+def chunk_version(chunk: str, meta: dict) -> list:
+    return [meta.get("repo"), meta.get("path"), meta.get("chunk_id"), meta.get("hash") or chunk_hash(chunk)]
+
+
+class AnswerCache:
+    # answers keyed by question embedding *and* the chunk versions retrieved for it: a hit needs a
+    # similar question whose retrieval returns exactly the same chunks, so it only skips the LLM call
+    def __init__(self, path: Path, model: str, embed_key: str, threshold: float = 0.92, max_entries: int = 1000):
+        self.path = Path(path)
+        self.model = model
+        self.embed_key = embed_key
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries = []
+        self._matrix = None  # stacked question embeddings, rebuilt lazily
+        self._lines = None  # entries in the file; None until it has been (re)written for this model
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            self._load()
+
+    def _load(self):  # first line is a header, then one entry per line, appended as answers come in
+        with open(self.path, "r", encoding="utf-8") as f:
+            content = f.read()
+        lines = content.splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            return
+        if header.get("model") != self.model or header.get("embed_key") != self.embed_key:
+            return
+
+        for line in lines[1:]:
+            try:
+                self.entries.append(json.loads(line))
+            except json.JSONDecodeError:  # torn last line from a crash
+                continue
+        self.entries = self.entries[-self.max_entries:]
+        if content.endswith("\n"):
+            self._lines = len(lines) - 1
+
+    def _embeddings(self):
+        if self._matrix is None:
+            self._matrix = np.array([e["embedding"] for e in self.entries], dtype="float32")
+        return self._matrix
+
+    def lookup(self, q_emb, chunks_with_meta):
+        versions = {tuple(chunk_version(chunk, meta)) for chunk, meta in chunks_with_meta}
+        with self._lock:
+            if self.entries:
+                similarities = self._embeddings() @ np.asarray(q_emb, dtype="float32")
+                newest_first = np.argsort(-similarities[::-1], kind="stable")  # ties go to the latest answer
+                for i in len(similarities) - 1 - newest_first:  # most similar first, stop below the threshold
+                    if similarities[i] < self.threshold:
+                        break
+                    entry = self.entries[i]
+                    if {tuple(v) for v in entry["chunks"]} == versions:
+                        tracing.count("answer_cache.hit")
+                        return {**entry, "similarity": float(similarities[i])}
+
+            tracing.count("answer_cache.miss")
+            return None
+
+    def put(self, question: str, q_emb, chunks_with_meta, answer: str):
+        entry = {
+            "question": question,
+            "embedding": np.asarray(q_emb, dtype="float32").round(6).tolist(),
+            "chunks": [chunk_version(chunk, meta) for chunk, meta in chunks_with_meta],
+            "answer": answer,
+            "created_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self.entries.append(entry)
+            if len(self.entries) > self.max_entries:  # oldest first
+                self.entries = self.entries[-self.max_entries:]
+            self._matrix = None
+
+            if self._lines is None or self._lines >= 2 * self.max_entries:
+                self._rewrite()  # new file, or too many evicted entries still on disk
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._lines += 1
+
+    def _rewrite(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"model": self.model, "embed_key": self.embed_key}) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._lines = len(self.entries)
+
+
+def load_answer_cache(config: dict):
+    if not config.get("answer_cache", False):
+        return None
+
+    from embedding_cache import model_key
+    from sharding import index_root
+
+    return AnswerCache(
+        config.get("answer_cache_file") or index_root(config) / "answer_cache.jsonl",
+        model=config["model_name"],
+        embed_key=model_key(config),
+        threshold=float(config.get("answer_cache_threshold", 0.92)),
+        max_entries=int(config.get("answer_cache_max_entries", 1000)),
+    )
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import agent as retrieval
+import tracing
+
+
+CONFIG_PATH = Path(__file__).parent / "config.json"
+TEXT_FIELDS = ("question", "task", "query", "body")
+ID_FIELDS = ("id", "request_id")
+AGENT_ERROR_PREFIX = "Error processing message:"  # ToolUsingAgent returns failures instead of raising
+
+
+def read_items(path: Path) -> list:
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            item_id = next((str(record[k]) for k in ID_FIELDS if k in record), f"line-{line_no}")
+            text = next((record[k] for k in TEXT_FIELDS if record.get(k)), None)
+            if text is None:
+                raise ValueError(f"{path}:{line_no} has none of the fields {', '.join(TEXT_FIELDS)}")
+            if record.get("title") and "question" not in record:
+                text = f"{record['title']}\n\n{text}"
+            items.append({"id": item_id, "text": text})
+    return items
+
+
+def finished_ids(path: Path, retry_errors: bool) -> set:  # what a previous (possibly crashed) run already wrote
+    done = set()
+    if not path.exists():
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # torn last line from a crash
+                continue
+            if record.get("status") == "ok" or not retry_errors:
+                done.add(record["id"])
+    return done
+
+
+class ResultWriter:  # one JSON line per item, flushed and fsynced so a crash loses at most the item in flight
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        needs_newline = path.exists() and path.stat().st_size > 0 and not path.read_bytes().endswith(b"\n")
+        self.fh = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self.fh.write("\n")
+        self.lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.fh.write(line)
+            self.fh.flush()
+            os.fsync(self.fh.fileno())
+
+    def close(self):
+        self.fh.close()
+
+
+class BatchRunner:
+    def __init__(self, mode: str = "question", allow_modifications: bool = False):
+        self.mode = mode
+        self.allow_modifications = allow_modifications
+        self._local = threading.local()  # one ToolUsingAgent per worker thread
+
+    def _tool_agent(self):
+        bot = getattr(self._local, "agent", None)
+        if bot is None:
+            from toolls_agent import ToolUsingAgent
+
+            bot = ToolUsingAgent(config_path=str(CONFIG_PATH), use_reasoning=True)
+            # nobody is there to answer the confirmation prompt
+            bot.tool_executor.config["allow_modifications"] = self.allow_modifications
+            bot.tool_executor.config["require_confirmation"] = False
+            self._local.agent = bot
+        return bot
+
+    def run_item(self, item: dict) -> dict:
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        try:
+            with tracing.span("batch.item", item_id=item["id"], mode=self.mode):
+                if self.mode == "question":
+                    output = retrieval.answer_question(item["text"])
+                else:
+                    bot = self._tool_agent()
+                    bot.history = bot.history[:1]  # items are independent
+                    output = bot.process_message(item["text"])
+                    if output.startswith(AGENT_ERROR_PREFIX):  # e.g. ollama down, must be retried later
+                        raise RuntimeError(output[len(AGENT_ERROR_PREFIX):].strip())
+            status, error = "ok", None
+        except Exception as e:
+            output, status, error = None, "error", f"{type(e).__name__}: {e}"
+
+        record = {"id": item["id"], "status": status, "mode": self.mode, "output": output,
+                  "started_at": started_at, "duration_ms": round((time.perf_counter() - start) * 1000, 1)}
+        if error:
+            record["error"] = error
+        return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions/tasks without the interactive loop")
+    parser.add_argument("input", type=Path, help="JSONL with a question/task/query/body field and optional id")
+    parser.add_argument("-o", "--output", type=Path, help="results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--mode", choices=["question", "task"], default="question",
+                        help="'question' uses agent.answer_question, 'task' the tool-using agent")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retry-errors", action="store_true", help="re-run items that failed in a previous run")
+    parser.add_argument("--allow-modifications", action="store_true", help="let tasks modify files (no confirmation)")
+    args = parser.parse_args()
+
+    output = args.output or args.input.with_suffix(".results.jsonl")
+    items = read_items(args.input)
+    done = finished_ids(output, args.retry_errors)
+    pending = [item for item in items if item["id"] not in done]
+    print(f"{len(items)} items, {len(done)} already done, {len(pending)} to run with concurrency {args.concurrency}")
+    if not pending:
+        return
+
+    print("Loading index and models...")  # once, shared by all workers
+    retrieval.load_search_state()
+    retrieval.load_answer_cache()
+
+    runner = BatchRunner(args.mode, args.allow_modifications)
+    writer = ResultWriter(output)
+    start = time.perf_counter()
+    failed = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="batch")
+    try:
+        futures = {pool.submit(runner.run_item, item): item for item in pending}
+        for n, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            writer.write(record)
+            failed += record["status"] != "ok"
+            print(f"[batch] {n}/{len(pending)} {record['id']}: {record['status']} in {record['duration_ms']:.0f} ms")
+    except BaseException:  # Ctrl-C or a failed write: don't spend LLM calls on results nobody will record
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("\n[batch] Stopped, queued items cancelled; rerun to resume")
+        raise
+    finally:
+        pool.shutdown()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {len(pending) - failed} ok, {failed} failed in {elapsed:.1f}s "
+          f"({len(pending) / elapsed:.2f} items/s). Results: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from common import ROOT, load_bench_encoder, synthetic_repo, write_report
+from embeddings import BucketedEncoder, SentenceTransformerEncoder
+from index_repo import chunk_text, iter_files
+from sharding import DOCS_FILE, built_shards
+
+
+def load_texts(config: dict, limit: int, synthetic_files: int):
+    if synthetic_files:
+        root = synthetic_repo(Path(tempfile.mkdtemp(prefix="bench_encoding_")), synthetic_files)
+        texts = []
+        for path in iter_files(root):
+            texts.extend(chunk_text(path.read_text(encoding="utf-8"), config["chunk_size"], config["chunk_overlap"]))
+        return texts[:limit]
+
+    shards = built_shards(config)
+    if not shards:
+        raise SystemExit("No index found. Run python index_repo.py or pass --synthetic N")
+    texts = []
+    for _, directory in shards:
+        with open(directory / DOCS_FILE, "r", encoding="utf-8") as f:
+            texts.extend(d["text"] for d in json.load(f))
+    return texts[:limit]
+
+
+def run(name: str, encode, texts, **settings) -> dict:
+    start = time.perf_counter()
+    emb = encode(texts)
+    seconds = time.perf_counter() - start
+    row = {"config": name, **settings, "chunks": len(texts), "seconds": round(seconds, 3),
+           "chunks_per_s": round(len(texts) / seconds, 1)}
+    print(f"{name:<28} {row['chunks_per_s']:>10.1f} chunks/s")
+    return row, emb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput (chunks/s) per batching configuration")
+    parser.add_argument("--encoder", choices=["hash", "config"], default="config",
+                        help="'config' uses embed_backend/embed_model from config.json")
+    parser.add_argument("--limit", type=int, default=5000, help="max chunks to encode")
+    parser.add_argument("--synthetic", type=int, default=0, help="encode chunks of N generated files instead of docs.json")
+    parser.add_argument("--batch-sizes", default="16,32,64")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="process counts to try")
+    parser.add_argument("--out", type=Path)
+    args = parser.parse_args()
+
+    with open(ROOT / "config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    texts = load_texts(config, args.limit, args.synthetic)
+    encoder = load_bench_encoder(args.encoder, config)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    workers = sorted({int(w) for w in args.workers.split(",")})
+    print(f"{len(texts)} chunks, encoder={args.encoder}, backend={config.get('embed_backend', 'torch')}")
+
+    rows = []
+    # what index_repo did before. SentenceTransformer.encode already sorts each call by length, so for the
+    # torch backend this row is not unsorted and the gain below comes from batch size and workers alone
+    if isinstance(encoder, SentenceTransformerEncoder):
+        name, batching = "encode(), batch 32, sorted inside", "sentence-transformers"
+    else:
+        name, batching = "file order, batch 32", "file-order"
+    row, _ = run(name, lambda t: encoder.encode(t, batch_size=32), texts, batching=batching, batch_size=32, workers=1)
+    rows.append(row)
+
+    for n_workers in workers:
+        if n_workers > 1 and args.encoder == "hash":  # pool processes load the configured model, not the stand-in
+            print(f"skipping workers={n_workers}: needs --encoder config")
+            continue
+        for batch_size in batch_sizes + ["auto"]:
+            bucketed = BucketedEncoder(encoder if n_workers == 1 else None, batch_size, n_workers,
+                                       {**config, "embed_batch_size": batch_size})
+            try:
+                if n_workers > 1:
+                    bucketed.encode(texts[:n_workers * 4])  # start the pool outside the timing
+                row, _ = run(f"sorted, batch {batch_size}, x{n_workers}", bucketed.encode, texts,
+                             batching="length-sorted", batch_size=batch_size, workers=n_workers)
+                if bucketed.batcher is not None:
+                    row["token_budget"] = bucketed.batcher.budget
+                rows.append(row)
+            finally:
+                bucketed.close()
+
+    best = max(rows, key=lambda r: r["chunks_per_s"])
+    print(f"\nBest: {best['config']} ({best['chunks_per_s']} chunks/s) -> "
+          f"embed_batch_size={json.dumps(best['batch_size'])}, embed_workers={best['workers']}")
+    write_report({"benchmark": "encoding", "encoder": args.encoder, "backend": config.get("embed_backend", "torch"),
+                  "cpu_count": os.cpu_count(), "results": rows, "best": best["config"]}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+from common import synthetic_shard
+from sharding import Shard, make_filter, matches_filter
+
+
+def post_filter_search(shard: Shard, q, top_k: int, doc_filter):  # the old way: over-fetch, filter in Python
+    fetch = top_k
+    while True:
+        _, idxs = shard.index.search(q, fetch)
+        hits = [i for i in idxs[0].tolist() if i >= 0 and matches_filter(shard.docs[i], doc_filter)]
+        if len(hits) >= top_k or fetch >= shard.index.ntotal:
+            return hits[:top_k]
+        fetch = min(shard.index.ntotal, fetch * 4)
+
+
+def time_ms(fn, queries) -> float:
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q[None, :])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(latencies), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of filtered vs unfiltered search on a synthetic shard")
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dirs", type=int, default=100, help="services/svcN directories the chunks are spread over")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--out", type=Path)
+    args = parser.parse_args()
+
+    shard = synthetic_shard(args.chunks, args.dim, args.dirs, args.index_type)
+    queries = np.random.default_rng(1).normal(size=(args.queries, args.dim)).astype("float32")
+
+    cases = {
+        "unfiltered": None,
+        "extension .ts (~33%)": make_filter(extensions=[".ts"]),
+        "glob services/svc1* (~11%)": make_filter(file_glob="services/svc1*"),
+        "prefix services/svc7 (1%)": make_filter(path_prefix="services/svc7"),
+        "prefix + glob (~0.01%)": make_filter(path_prefix="services/svc7/", file_glob="*/module7.*"),
+    }
+
+    rows = []
+    for name, doc_filter in cases.items():
+        row = {"case": name, "pushdown_ms_p50": time_ms(lambda q: shard.search(q, args.top_k, doc_filter), queries)}
+        if doc_filter:
+            row["matching_chunks"] = int(shard.id_mask(doc_filter).sum())
+            row["post_filter_ms_p50"] = time_ms(lambda q: post_filter_search(shard, q, args.top_k, doc_filter), queries)
+        rows.append(row)
+        print(json.dumps(row))
+
+    report = {"chunks": args.chunks, "index_type": args.index_type, "top_k": args.top_k, "results": rows}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
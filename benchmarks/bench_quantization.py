@@ -0,0 +1,127 @@
+import argparse
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+import faiss
+
+from common import ROOT
+from embeddings import load_encoder
+from sharding import DOCS_FILE, built_shards
+from vector_store import INDEX_TYPES, VectorIndex, build_index
+
+
+def load_texts(config: dict, limit: int):
+    shards = built_shards(config)
+    if not shards:
+        raise SystemExit("No index found. Please run: python index_repo.py")
+
+    texts = []
+    for _, directory in shards:
+        with open(directory / DOCS_FILE, "r", encoding="utf-8") as f:
+            texts.extend(d["text"] for d in json.load(f))
+    return texts[:limit]
+
+
+def index_bytes(index, rescore) -> int:
+    if isinstance(index, faiss.IndexBinary):
+        size = faiss.serialize_index_binary(index).nbytes
+    else:
+        size = faiss.serialize_index(index).nbytes
+    return size + (rescore.nbytes if rescore is not None else 0)
+
+
+def recall_at_k(truth_ids, ids) -> float:
+    hits = sum(len(set(t) & set(r)) for t, r in zip(truth_ids.tolist(), ids.tolist()))
+    return hits / truth_ids.size
+
+
+def bench_encoder(encoder, texts, queries, batch_size):
+    start = time.perf_counter()
+    emb = encoder.encode(texts, batch_size=batch_size)
+    corpus_s = time.perf_counter() - start
+
+    latencies = []
+    q_emb = []
+    for q in queries:  # one query at a time, like the REPL does
+        start = time.perf_counter()
+        q_emb.append(encoder.encode([q])[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return emb, np.vstack(q_emb), {
+        "corpus_chunks_per_s": round(len(texts) / corpus_s, 1),
+        "query_encode_ms_p50": round(statistics.median(latencies), 2),
+        "query_encode_ms_max": round(max(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index size, encode latency and recall vs the float32 baseline")
+    parser.add_argument("--limit", type=int, default=5000, help="max chunks taken from docs.json")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--out", type=Path, help="write JSON results here as well as stdout")
+    args = parser.parse_args()
+
+    with open(ROOT / "config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    texts = load_texts(config, args.limit)
+    random.seed(0)
+    queries = [t[:200] for t in random.sample(texts, min(args.queries, len(texts)))]  # chunk prefixes as queries
+
+    backends = ["torch", "onnx"]
+    rows = []
+    truth_ids = None
+
+    for backend in backends:
+        try:
+            encoder = load_encoder({**config, "embed_backend": backend})
+        except ImportError as e:
+            print(f"Skipping {backend} backend: {e}")
+            continue
+
+        print(f"Encoding {len(texts)} chunks with {backend} backend...")
+        emb, q_emb, encode_stats = bench_encoder(encoder, texts, queries, args.batch_size)
+
+        if truth_ids is None:  # torch + flat float32 is the reference
+            reference = faiss.IndexFlatIP(emb.shape[1])
+            reference.add(emb)
+            _, truth_ids = reference.search(q_emb, args.top_k)
+
+        for index_type in sorted(INDEX_TYPES):
+            index, rescore = build_index(emb, index_type)
+            store = VectorIndex(index, index_type, rescore, args.rescore_factor)
+
+            latencies = []
+            ids = []
+            for q in q_emb:
+                start = time.perf_counter()
+                _, found = store.search(q[None, :], args.top_k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                ids.append(found[0])
+
+            rows.append({
+                "embed_backend": backend,
+                "index_type": index_type,
+                "index_bytes": index_bytes(index, rescore),
+                "search_ms_p50": round(statistics.median(latencies), 3),
+                f"recall@{args.top_k}": round(recall_at_k(truth_ids, np.vstack(ids)), 4),
+                **encode_stats,
+            })
+            print(json.dumps(rows[-1]))
+
+    report = {"chunks": len(texts), "queries": len(queries), "top_k": args.top_k, "results": rows}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import common  # noqa: F401  (puts the repo root on sys.path)
+import agent
+from reranker import CrossEncoderReranker, DEFAULT_RERANK_MODEL
+from sharding import search_shards
+
+
+def estimate_tokens(chunks) -> int:
+    return sum(len(chunk) for chunk, _ in chunks) // 4  # rough estimate: 4 chars per token, as in memory.py
+
+
+def hit(chunks, expected_path: str) -> bool:
+    return any(meta["path"].replace("\\", "/").endswith(expected_path) for _, meta in chunks)
+
+
+def summarize(runs):
+    return {
+        "hit_rate": round(sum(r["hit"] for r in runs) / len(runs), 3),
+        "avg_chunks": round(statistics.mean(r["chunks"] for r in runs), 2),
+        "avg_tokens": round(statistics.mean(r["tokens"] for r in runs), 1),
+        "latency_ms_p50": round(statistics.median(r["ms"] for r in runs), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunks/tokens sent to the LLM with and without cross-encoder reranking")
+    parser.add_argument("--queries", type=Path, default=Path(__file__).parent / "queries.jsonl",
+                        help="JSONL with question and expected_path")
+    parser.add_argument("--top-k", type=int, default=agent.TOP_K, help="first-stage chunks sent today")
+    parser.add_argument("--candidates", type=int, default=int(agent.config.get("rerank_candidates", 20)))
+    parser.add_argument("--min-score", type=float, default=agent.config.get("rerank_min_score"))
+    parser.add_argument("--model", default=agent.config.get("rerank_model", DEFAULT_RERANK_MODEL))
+    parser.add_argument("--out", type=Path)
+    args = parser.parse_args()
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+
+    shards = agent.load_shards()
+    embed_model = agent.load_embed_model()
+    reranker = CrossEncoderReranker(args.model, budget_ms=float("inf"), min_score=args.min_score)
+
+    baseline, reranked = [], {k: [] for k in range(1, args.top_k + 1)}
+    for item in queries:
+        start = time.perf_counter()
+        q_emb = embed_model.encode([item["question"]])
+        candidates = search_shards(shards, q_emb, max(args.top_k, args.candidates))
+        first_stage_ms = (time.perf_counter() - start) * 1000
+
+        first = candidates[:args.top_k]
+        baseline.append({"hit": hit(first, item["expected_path"]), "chunks": len(first),
+                         "tokens": estimate_tokens(first), "ms": first_stage_ms})
+
+        start = time.perf_counter()
+        ranked = reranker.rerank(item["question"], candidates, len(candidates))
+        rerank_ms = (time.perf_counter() - start) * 1000
+
+        for keep in reranked:
+            chunks = ranked[:keep]
+            reranked[keep].append({"hit": hit(chunks, item["expected_path"]), "chunks": len(chunks),
+                                   "tokens": estimate_tokens(chunks), "ms": first_stage_ms + rerank_ms})
+
+    report = {"queries": len(queries), "baseline": {"top_k": args.top_k, **summarize(baseline)}, "reranked": []}
+    for keep, runs in reranked.items():
+        report["reranked"].append({"keep": keep, **summarize(runs)})
+
+    equal = [r for r in report["reranked"] if r["hit_rate"] >= report["baseline"]["hit_rate"]]
+    if equal:  # smallest context that finds the expected file as often as today
+        best = min(equal, key=lambda r: r["avg_tokens"])
+        report["token_reduction"] = round(1 - best["avg_tokens"] / max(1, report["baseline"]["avg_tokens"]), 3)
+        report["chunk_reduction"] = round(1 - best["avg_chunks"] / max(1, report["baseline"]["avg_chunks"]), 3)
+        report["recommended_keep"] = best["keep"]
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+class HashEncoder:  # deterministic stand-in for the embedding model, no torch or model download needed
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False):
+        emb = np.empty((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            emb[i] = np.random.default_rng(seed).normal(size=self.dim)
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+        return emb
+
+
+def load_bench_encoder(name: str, config: dict):
+    if name == "hash":
+        return HashEncoder()
+    from embeddings import load_encoder
+
+    return load_encoder(config)
+
+
+def latency_stats(samples_ms) -> dict:
+    samples = sorted(samples_ms)
+    return {
+        "n": len(samples),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+    }
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0, block: int = 100_000):
+    rng = np.random.default_rng(seed)
+    emb = np.empty((n, dim), dtype="float32")
+    for start in range(0, n, block):  # in blocks to keep the float64 temporaries small
+        part = rng.standard_normal(size=(min(block, n - start), dim), dtype="float32")
+        emb[start:start + len(part)] = part / np.linalg.norm(part, axis=1, keepdims=True)
+    return emb
+
+
+def synthetic_shard(n_chunks: int, dim: int = 384, n_dirs: int = 100, index_type: str = "flat"):
+    from sharding import Shard
+    from vector_store import VectorIndex, build_index
+
+    docs = []
+    for i in range(n_chunks):
+        rel_path = f"services/svc{i % n_dirs}/module{i % 97}.{'py' if i % 3 else 'ts'}"
+        docs.append({"path": f"/repo/{rel_path}", "rel_path": rel_path, "chunk_id": 0, "text": f"chunk {i}"})
+
+    index, rescore = build_index(synthetic_vectors(n_chunks, dim), index_type)
+    return Shard("synthetic", None, VectorIndex(index, index_type, rescore), docs)
+
+
+def synthetic_repo(root: Path, n_files: int, functions_per_file: int = 20) -> Path:
+    for i in range(n_files):
+        package = root / f"pkg{i % 10}"
+        package.mkdir(parents=True, exist_ok=True)
+        body = []
+        for j in range(functions_per_file):
+            body.append(
+                f"def handler_{i}_{j}(request, config=None):\n"
+                f"    \"\"\"Handle request type {j} for service {i}.\"\"\"\n"
+                f"    value = request.get('field_{j}', {j})\n"
+                f"    if config and config.get('debug'):\n"
+                f"        print('handler_{i}_{j}', value)\n"
+                f"    return value * {i + 1}\n"
+            )
+        (package / f"module_{i}.py").write_text("\n\n".join(body), encoding="utf-8")
+    return root
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_report(report: dict, out: Path = None):
+    report = {"commit": git_commit(), "timestamp": datetime.now().isoformat(), **report}
+    if out:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return report
@@ -0,0 +1,50 @@
+import argparse
+import json
+from pathlib import Path
+
+
+def flatten(data, prefix=""):  # {"a": {"b": 1}} -> {"a.b": 1}, lists indexed by position
+    items = data.items() if isinstance(data, dict) else enumerate(data)
+    flat = {}
+    for key, value in items:
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, (dict, list)):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two run_all.py reports")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="flag *_ms increases and *_per_s drops larger than this fraction")
+    args = parser.parse_args()
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    old, new = flatten(baseline), flatten(candidate)
+    print(f"{baseline.get('commit')} -> {candidate.get('commit')}")
+
+    regressions = 0
+    for name in sorted(old.keys() & new.keys()):
+        if name.startswith("settings.") or old[name] == new[name]:
+            continue
+        change = (new[name] - old[name]) / old[name] if old[name] else float("inf")
+        flag = ""
+        slower = (name.endswith("_ms") and change > args.threshold) or \
+            (name.endswith("_per_s") and change < -args.threshold)  # throughput: lower is worse
+        if slower:
+            flag = "  <-- regression"
+            regressions += 1
+        print(f"  {name:<45}{old[name]:>12}{new[name]:>12}{change:>+9.1%}{flag}")
+
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
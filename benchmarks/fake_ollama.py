@@ -0,0 +1,138 @@
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):  # just enough of /api/chat for the ollama client
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            return self._send_json({"version": "0.0.0-fake"})
+        if self.path == "/api/tags":
+            return self._send_json({"models": []})
+        self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            return self._send_json({"error": "not found"}, 404)
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = request.get("messages", [])
+        settings = self.server.settings
+        self.server.requests += 1
+
+        if settings["tool_call"] and messages and messages[-1].get("role") == "user":
+            content = json.dumps({"tool_calls": [settings["tool_call"]]})
+        else:
+            content = " ".join(["token"] * settings["completion_tokens"])
+
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        completion_tokens = settings["completion_tokens"]
+        latency_s = (settings["first_token_ms"] + settings["per_token_ms"] * completion_tokens) / 1000
+
+        final = {
+            "model": request.get("model", "fake"),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(latency_s * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": completion_tokens,
+        }
+
+        if not request.get("stream", True):
+            time.sleep(latency_s)
+            return self._send_json({**final, "message": {"role": "assistant", "content": content}})
+
+        self.send_response(200)  # NDJSON stream, one line per token
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(settings["first_token_ms"] / 1000)
+        pieces = content.split(" ")
+        for i, piece in enumerate(pieces):
+            text = piece if i == 0 else " " + piece
+            self._write_chunk({"model": final["model"], "created_at": final["created_at"], "done": False,
+                               "message": {"role": "assistant", "content": text}})
+            time.sleep(settings["per_token_ms"] / 1000)
+        self._write_chunk({**final, "message": {"role": "assistant", "content": ""}})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, payload: dict):
+        line = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+
+
+class FakeOllamaServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, first_token_ms: float = 50,
+                 per_token_ms: float = 5, completion_tokens: int = 50, tool_call: dict = None):
+        self.httpd = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.requests = 0
+        self.httpd.settings = {
+            "first_token_ms": first_token_ms,
+            "per_token_ms": per_token_ms,
+            "completion_tokens": completion_tokens,
+            "tool_call": tool_call,  # returned for every request whose last message is from the user
+        }
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return self.httpd.requests
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-ollama", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server with configurable latency")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-ms", type=float, default=50)
+    parser.add_argument("--per-token-ms", type=float, default=5)
+    parser.add_argument("--completion-tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(port=args.port, first_token_ms=args.first_token_ms,
+                              per_token_ms=args.per_token_ms, completion_tokens=args.completion_tokens)
+    print(f"Fake Ollama listening on {server.url} (set OLLAMA_HOST={server.url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
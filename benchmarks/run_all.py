@@ -0,0 +1,192 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from common import ROOT, latency_stats, load_bench_encoder, synthetic_repo, synthetic_shard, write_report
+from fake_ollama import FakeOllamaServer
+
+import agent
+import tracing
+
+
+def quiet():  # the agent and tools print progress on every call
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def bench_config(work_dir: Path) -> dict:
+    with open(ROOT / "config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+    repo = work_dir / "repo"
+    config.update({
+        "repo_path": str(repo),
+        "index_dir": str(work_dir / "faiss_db"),
+        "shards": [{"name": "bench", "repo_path": str(repo), "extensions": [".py"]}],
+        "backup_dir": str(work_dir / "backups"),
+        "allow_modifications": True,
+        "require_confirmation": False,
+        "use_reranker": False,
+        "tracing": "off",
+    })
+    return config
+
+
+def bench_indexing(config: dict, encoder, n_files: int) -> dict:
+    import index_repo
+    from sharding import shard_configs, shard_dir
+
+    synthetic_repo(Path(config["repo_path"]), n_files)
+    shard = shard_configs(config)[0]
+
+    start = time.perf_counter()
+    with quiet():
+        index_repo.index_shard(shard, encoder, out_dir=shard_dir(config, shard["name"]))
+    seconds = time.perf_counter() - start
+
+    with open(shard_dir(config, shard["name"]) / "manifest.json", "r", encoding="utf-8") as f:
+        chunks = json.load(f)["count"]
+    return {"files": n_files, "chunks": chunks, "seconds": round(seconds, 3),
+            "files_per_s": round(n_files / seconds, 1), "chunks_per_s": round(chunks / seconds, 1)}
+
+
+def bench_retrieval(encoder, sizes, n_queries: int, top_k: int, index_type: str) -> dict:
+    from sharding import search_shards
+
+    queries = [f"function that handles request type {i}" for i in range(n_queries)]
+    encode_ms = []
+    q_embs = []
+    for q in queries:
+        start = time.perf_counter()
+        q_embs.append(encoder.encode([q]))
+        encode_ms.append((time.perf_counter() - start) * 1000)
+
+    results = {"query_encode": latency_stats(encode_ms)}
+    for size in sizes:
+        shard = synthetic_shard(size, dim=q_embs[0].shape[1], index_type=index_type)
+        search_ms = []
+        for q_emb in q_embs:  # faiss search + docs lookup + merge, i.e. retrieve_chunks minus encoding
+            start = time.perf_counter()
+            search_shards([shard], q_emb, top_k)
+            search_ms.append((time.perf_counter() - start) * 1000)
+        results[f"search_{size}"] = latency_stats(search_ms)
+        del shard
+    return results
+
+
+def use_bench_index(config: dict, encoder):  # point agent's lazy search state at the benchmark shard
+    tracing.configure(config)  # importing agent configured it from the root config.json
+    agent.config = config
+    agent.shards = None
+    agent.embed_model = encoder
+    agent.reranker = None
+    agent._reranker_loaded = True
+
+
+def bench_tools(config_path: Path, config: dict, repeats: int) -> dict:
+    from tools.implementations import ToolExecutor
+
+    executor = ToolExecutor(str(config_path))
+    files = sorted(Path(config["repo_path"]).rglob("*.py"))
+    rel = [f.relative_to(config["repo_path"]).as_posix() for f in files]
+    random.seed(0)
+
+    calls = {
+        "search_codebase": lambda i: {"query": f"handler for request type {i}", "top_k": 5},
+        "read_file": lambda i: {"file_path": random.choice(rel)},
+        "list_files": lambda i: {"directory_path": "."},
+        "modify_file": lambda i: {"file_path": rel[0], "change_description": "bench",
+                                  "new_code": f"# bench {i}"},
+    }
+
+    results = {}
+    for tool_name, make_args in calls.items():
+        samples = []
+        for i in range(repeats):
+            arguments = make_args(i)
+            start = time.perf_counter()
+            with quiet():
+                output = executor.execute_tool(tool_name, arguments)
+            samples.append((time.perf_counter() - start) * 1000)
+            if output.startswith("ERROR"):
+                raise RuntimeError(f"{tool_name} failed during benchmark: {output[:200]}")
+        results[tool_name] = latency_stats(samples)
+    return results
+
+
+def bench_turns(config_path: Path, server: FakeOllamaServer, turns: int, use_reasoning: bool) -> dict:
+    from toolls_agent import ToolUsingAgent
+
+    with quiet():
+        bot = ToolUsingAgent(config_path=str(config_path), use_reasoning=use_reasoning)
+
+    samples = []
+    requests_before = server.requests
+    for i in range(turns):
+        bot.history = bot.history[:1]  # every turn starts from the same context size
+        start = time.perf_counter()
+        with quiet():
+            bot.process_message(f"Find the handler for request type {i}")
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {"use_reasoning": use_reasoning, "llm_calls_per_turn": (server.requests - requests_before) / turns,
+            **latency_stats(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark suite against a fake Ollama server")
+    parser.add_argument("--encoder", choices=["hash", "config"], default="hash",
+                        help="'hash' needs no model and isolates our own overhead; 'config' uses config.json")
+    parser.add_argument("--files", type=int, default=200, help="files in the synthetic repo")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="chunk counts for retrieval latency")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20, help="calls per tool")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--first-token-ms", type=float, default=50)
+    parser.add_argument("--per-token-ms", type=float, default=5)
+    parser.add_argument("--completion-tokens", type=int, default=50)
+    parser.add_argument("--only", action="append", choices=["indexing", "retrieval", "tools", "turns"])
+    parser.add_argument("--out", type=Path, help="JSON report path, e.g. benchmarks/results/<commit>.json")
+    args = parser.parse_args()
+    sections = set(args.only or ["indexing", "retrieval", "tools", "turns"])
+
+    work_dir = Path(tempfile.mkdtemp(prefix="agent-bench-"))
+    config = bench_config(work_dir)
+    config_path = work_dir / "config.json"
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    server = FakeOllamaServer(first_token_ms=args.first_token_ms, per_token_ms=args.per_token_ms,
+                              completion_tokens=args.completion_tokens,
+                              tool_call={"name": "search_codebase", "arguments": {"query": "request handler", "top_k": 5}})
+    os.environ["OLLAMA_HOST"] = server.url  # read by ollama when agent.chat first imports it
+
+    report = {"settings": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()}}
+    encoder = load_bench_encoder(args.encoder, config)
+    try:
+        with server:
+            use_bench_index(config, encoder)  # loaded lazily, so the index built next is what gets searched
+            report["indexing"] = bench_indexing(config, encoder, args.files)
+            if "retrieval" in sections:
+                sizes = [int(s) for s in args.sizes.split(",") if s]
+                report["retrieval"] = bench_retrieval(encoder, sizes, args.queries, args.top_k, args.index_type)
+            if "tools" in sections:
+                report["tools"] = bench_tools(config_path, config, args.repeats)
+            if "turns" in sections:
+                report["turns"] = [bench_turns(config_path, server, args.turns, use_reasoning)
+                                   for use_reasoning in (False, True)]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
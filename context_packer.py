@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4  # rough estimate: 4 chars per token, as in memory.py
+
+
+def _span(text: str, meta: dict, stride: int = None) -> dict:
+    start = meta.get("start")
+    if start is None and stride and meta.get("chunk_id") is not None:
+        start = meta["chunk_id"] * stride  # chunk_text advances by chunk_size - overlap
+    return {
+        "path": meta.get("path", "unknown"),
+        "repo": meta.get("repo"),
+        "start": start,
+        "end": start + len(text) if start is not None else None,
+        "start_line": meta.get("start_line"),
+        "text": text,
+        "score": meta.get("score", 0.0),
+        "chunks": 1,
+        "duplicates": list(meta.get("duplicates", [])),  # other files with this exact chunk text
+    }
+
+
+def _overlap(selected: list, span: dict) -> int:  # chars of span already covered by chunks from the same file
+    if span["start"] is None:
+        return 0
+    covered = 0
+    for other in selected:
+        if other["start"] is not None:
+            covered += max(0, min(other["end"], span["end"]) - max(other["start"], span["start"]))
+    return min(covered, len(span["text"]))
+
+
+def _merge(spans: list) -> list:  # overlapping or adjacent chunks of one file become one block
+    positioned = sorted((s for s in spans if s["start"] is not None), key=lambda s: s["start"])
+    merged = []
+    for span in positioned:
+        current = merged[-1] if merged else None
+        if current and span["start"] <= current["end"]:
+            if span["end"] > current["end"]:
+                current["text"] += span["text"][current["end"] - span["start"]:]
+                current["end"] = span["end"]
+            current["score"] = max(current["score"], span["score"])
+            current["chunks"] += 1
+            current["duplicates"] = list(dict.fromkeys(current["duplicates"] + span["duplicates"]))
+        else:
+            merged.append(dict(span))
+    return merged + [s for s in spans if s["start"] is None]
+
+
+def pack_context(chunks_with_meta, token_budget: int, stride: int = None) -> list:
+    # greedy by score: a chunk costs only the text it adds, so neighbours of an already
+    # selected chunk are cheap; blocks come out grouped by file (best file first) and in line order
+    selected = defaultdict(list)
+    used = 0
+
+    for text, meta in sorted(chunks_with_meta, key=lambda c: c[1].get("score", 0.0), reverse=True):
+        span = _span(text, meta, stride)
+        cost = estimate_tokens(span["text"][_overlap(selected[span["path"]], span):]) if span["text"] else 0
+        if used + cost > token_budget:
+            if used == 0:  # never send an empty context, trim the best chunk instead
+                span["text"] = span["text"][:token_budget * 4]
+                span["end"] = span["start"] + len(span["text"]) if span["start"] is not None else None
+                selected[span["path"]].append(span)
+                break
+            continue
+        selected[span["path"]].append(span)
+        used += cost
+
+    blocks = []
+    for path, spans in selected.items():
+        for block in _merge(spans):
+            if block["start_line"] is not None:
+                block["end_line"] = block["start_line"] + block["text"].rstrip("\n").count("\n")
+            blocks.append(block)
+
+    best = {path: max(s["score"] for s in spans) for path, spans in selected.items()}
+    blocks.sort(key=lambda b: (-best[b["path"]], b["path"], b["start"] if b["start"] is not None else 0))
+    return blocks
+
+
+def block_header(block: dict) -> str:
+    if block.get("start_line") is not None:
+        return f"File: {block['path']} (lines {block['start_line']}-{block['end_line']})"
+    return f"File: {block['path']}"
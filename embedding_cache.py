@@ -0,0 +1,82 @@
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def model_key(config: dict) -> str:  # vectors from different models/backends must never mix
+    parts = [config.get("embed_backend", "torch"), str(config.get("embed_model"))]
+    if config.get("embed_backend") == "onnx":
+        parts.append(str(config.get("onnx_file")))
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=6).hexdigest()
+
+
+class EmbeddingCache:  # chunk hash -> normalized vector, kept next to the shards and reused across rebuilds
+    def __init__(self, directory: Path, key: str):
+        self.path = Path(directory) / f"{key}.npz"
+        self.keys = []
+        self.vectors = None
+        self._rows = {}
+        self._new_keys = []
+        self._new_vectors = []
+
+        if self.path.exists():
+            data = np.load(self.path)
+            self.keys = data["keys"].tolist()
+            self.vectors = data["vectors"]
+            self._rows = {k: i for i, k in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self._rows) + len(self._new_keys)
+
+    def encode(self, model, texts: list, hashes: list, batch_size: int = 32, show_progress_bar: bool = False):
+        missing = [i for i, h in enumerate(hashes) if h not in self._rows]
+        print(f"Embedding cache: {len(hashes) - len(missing)} hits, {len(missing)} to encode")
+
+        new_emb = None
+        if missing:
+            new_emb = model.encode([texts[i] for i in missing], batch_size=batch_size,
+                                   show_progress_bar=show_progress_bar)
+            self._new_keys.extend(hashes[i] for i in missing)
+            self._new_vectors.append(new_emb)
+
+        dim = new_emb.shape[1] if new_emb is not None else self.vectors.shape[1]
+        emb = np.empty((len(hashes), dim), dtype="float32")
+        if new_emb is not None:
+            emb[missing] = new_emb
+        hits = [i for i, h in enumerate(hashes) if h in self._rows]
+        if hits:
+            emb[hits] = self.vectors[[self._rows[hashes[i]] for i in hits]]
+        return emb
+
+    def save(self):
+        if not self._new_keys:
+            return
+        parts = ([self.vectors] if self.vectors is not None else []) + self._new_vectors
+        self.vectors = np.vstack(parts).astype("float32")
+        self.keys = self.keys + self._new_keys
+        self._rows = {k: i for i, k in enumerate(self.keys)}
+        self._new_keys, self._new_vectors = [], []
+        self._write()
+
+    def prune(self, keep: set) -> int:  # drop vectors no built shard references any more, so the file stops growing
+        self.save()
+        rows = [i for i, k in enumerate(self.keys) if k in keep]
+        removed = len(self.keys) - len(rows)
+        if removed:
+            self.keys = [self.keys[i] for i in rows]
+            self.vectors = self.vectors[rows]
+            self._rows = {k: i for i, k in enumerate(self.keys)}
+            self._write()
+        return removed
+
+    def _write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, keys=np.array(self.keys), vectors=self.vectors)
+        os.replace(tmp_path, self.path)  # a crash mid-write never leaves a truncated cache
@@ -0,0 +1,251 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from context_packer import estimate_tokens
+
+
+DEFAULT_EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_ONNX_FILE = "onnx/model_qint8_avx512.onnx"  # int8 quantized export shipped with the HF model repo
+EMBED_BACKENDS = {"torch", "onnx"}
+MAX_SEQ_TOKENS = 256  # both backends truncate here, so longer chunks cost no more
+BYTES_PER_TOKEN = 100_000  # rough activation footprint of a MiniLM-sized model per padded token
+
+
+class SentenceTransformerEncoder:  # original PyTorch path
+    def __init__(self, model_name: str, num_threads: int = None):
+        from sentence_transformers import SentenceTransformer
+
+        if num_threads:
+            import torch
+
+            torch.set_num_threads(num_threads)
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False):
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype("float32")
+
+
+class OnnxEncoder:  # onnxruntime + tokenizers only, torch is never imported
+    def __init__(self, model_name: str, onnx_file: str = DEFAULT_ONNX_FILE, max_length: int = MAX_SEQ_TOKENS,
+                 num_threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = _resolve_model_dir(model_name, onnx_file)
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()  # pad to the longest text in each batch
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_dir / onnx_file), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False):
+        parts = []
+        for start in range(0, len(texts), batch_size):
+            if show_progress_bar:
+                print(f"  Encoded {start}/{len(texts)} texts...")
+
+            batch = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            input_ids = np.array([e.ids for e in batch], dtype="int64")
+            attention_mask = np.array([e.attention_mask for e in batch], dtype="int64")
+
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self.session.run(None, feeds)[0]  # last_hidden_state: (batch, seq, dim)
+
+            mask = attention_mask[..., None].astype("float32")  # mean pooling, same as sentence-transformers
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            parts.append(pooled)
+
+        if not parts:
+            return np.zeros((0, 0), dtype="float32")
+
+        emb = np.vstack(parts).astype("float32")
+        emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+        return emb
+
+
+def _resolve_model_dir(model_name: str, onnx_file: str) -> Path:
+    path = Path(model_name)
+    if path.is_dir():
+        return path
+
+    from huggingface_hub import snapshot_download  # hub id, fetch only what we need
+
+    return Path(snapshot_download(repo_id=model_name, allow_patterns=["tokenizer.json", onnx_file]))
+
+
+def load_encoder(config: dict):
+    backend = config.get("embed_backend", "torch")
+    model_name = config.get("embed_model", DEFAULT_EMBED_MODEL)
+
+    threads = config.get("embed_threads")
+
+    if backend == "torch":
+        return SentenceTransformerEncoder(model_name, threads)
+    if backend == "onnx":
+        return OnnxEncoder(model_name, config.get("onnx_file", DEFAULT_ONNX_FILE), num_threads=threads)
+
+    raise ValueError(f"Unknown embed_backend '{backend}', expected one of {sorted(EMBED_BACKENDS)}")
+
+
+def available_memory() -> int:  # bytes, or None if we cannot tell
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):  # Windows without psutil
+        return None
+
+
+class AdaptiveBatcher:  # sizes batches by padded tokens and grows the budget while throughput keeps improving
+    def __init__(self, start_tokens: int = 32 * 128, min_tokens: int = MAX_SEQ_TOKENS, max_tokens: int = None):
+        if max_tokens is None:
+            free = available_memory()
+            max_tokens = free // 4 // BYTES_PER_TOKEN if free else 64 * MAX_SEQ_TOKENS  # use at most a quarter
+        self.max_tokens = max(min_tokens, max_tokens)
+        self.min_tokens = min_tokens
+        self.budget = min(max(start_tokens, min_tokens), self.max_tokens)
+        self.best_budget, self.best_rate = self.budget, 0.0
+        self.settled = False
+
+    def batch_size(self, longest: int) -> int:
+        return max(1, self.budget // max(1, longest))
+
+    def record(self, tokens: int, seconds: float):
+        if self.settled or seconds <= 0:
+            return
+        rate = tokens / seconds
+        if rate > self.best_rate * 1.05:  # still paying off, try a bigger batch
+            self.best_budget, self.best_rate = self.budget, rate
+            if self.budget < self.max_tokens:
+                self.budget = min(self.budget * 2, self.max_tokens)
+                return
+        self.budget = self.best_budget  # no gain (or at the memory cap), stay at the best seen
+        self.settled = True
+
+    def shrink(self):  # after a failed allocation
+        self.max_tokens = max(self.min_tokens, self.budget // 2)
+        self.budget = self.best_budget = min(self.best_budget, self.max_tokens)
+
+
+def _out_of_memory(error: Exception) -> bool:  # torch reports a failed allocation as RuntimeError, not MemoryError
+    if isinstance(error, MemoryError):
+        return True
+    message = str(error).lower()
+    return any(s in message for s in ("out of memory", "can't allocate memory", "not enough memory", "bad allocation"))
+
+
+_worker_encoder = None  # BucketedEncoder living in each pool process
+
+
+def _init_worker(config: dict):
+    global _worker_encoder
+    _worker_encoder = BucketedEncoder(load_encoder(config), config.get("embed_batch_size", "auto"))
+
+
+def _encode_in_worker(texts):
+    return _worker_encoder.encode(texts)
+
+
+class BucketedEncoder:  # same encode() as the encoders: length-sorted batches, optionally spread over processes
+    def __init__(self, encoder, batch_size=32, workers: int = 1, config: dict = None):
+        self.encoder = encoder
+        self.batcher = AdaptiveBatcher() if batch_size == "auto" else None
+        self.fixed_batch_size = None if batch_size == "auto" else int(batch_size)
+        self.workers = workers
+        self.config = config or {}
+        self._pool = None
+
+    def _batches(self, order, lengths):  # order is longest first, so each batch is padded to its first text
+        start = 0
+        while start < len(order):
+            size = self.fixed_batch_size or self.batcher.batch_size(lengths[order[start]])
+            yield order[start:start + size]
+            start += size
+
+    def encode(self, texts, batch_size: int = None, show_progress_bar: bool = False):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        lengths = np.array([min(estimate_tokens(t), MAX_SEQ_TOKENS) for t in texts])
+        order = np.argsort(-lengths, kind="stable")
+
+        if self.encoder is None or (self.workers > 1 and len(texts) > 1):  # no local model with workers > 1
+            sorted_emb = self._encode_parallel([texts[i] for i in order])
+        else:
+            parts = []
+            done = 0
+            for batch in self._batches(order, lengths):
+                parts.append(self._encode_batch([texts[i] for i in batch], int(lengths[batch].sum())))
+                done += len(batch)
+                if show_progress_bar and len(parts) % 20 == 0:
+                    print(f"  Encoded {done}/{len(texts)} texts...")
+            sorted_emb = np.vstack(parts)
+
+        emb = np.empty_like(sorted_emb)
+        emb[order] = sorted_emb
+        return emb
+
+    def _encode_batch(self, batch_texts, tokens: int):
+        start = time.perf_counter()
+        try:
+            emb = self.encoder.encode(batch_texts, batch_size=len(batch_texts))
+        except (MemoryError, RuntimeError) as e:
+            if not _out_of_memory(e) or self.batcher is None or len(batch_texts) == 1:
+                raise
+            self.batcher.shrink()
+            half = len(batch_texts) // 2
+            return np.vstack([self._encode_batch(batch_texts[:half], tokens // 2),
+                              self._encode_batch(batch_texts[half:], tokens - tokens // 2)])
+        if self.batcher is not None:
+            self.batcher.record(tokens, time.perf_counter() - start)
+        return emb
+
+    def _encode_parallel(self, sorted_texts):  # like SentenceTransformer.start_multi_process_pool, any backend
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)  # no oversubscription
+            worker_config = {**self.config, "embed_threads": threads}
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(worker_config,))
+
+        size = max(1, -(-len(sorted_texts) // (self.workers * 4)))  # a few jobs per worker to balance lengths
+        jobs = [sorted_texts[i:i + size] for i in range(0, len(sorted_texts), size)]
+        return np.vstack(list(self._pool.map(_encode_in_worker, jobs)))
+
+    def describe(self) -> str:
+        batching = f"batch_size={self.fixed_batch_size}" if self.batcher is None else \
+            f"auto (token budget {self.batcher.budget})"
+        return f"{batching}, workers={self.workers}"
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def load_bucketed_encoder(config: dict, encoder=None) -> BucketedEncoder:
+    workers = int(config.get("embed_workers", 1)) or os.cpu_count() or 1  # 0 = one per core
+    if encoder is None and workers == 1:
+        encoder = load_encoder(config)  # with workers > 1 only the pool processes load the model
+    return BucketedEncoder(encoder, config.get("embed_batch_size", "auto"), workers, config)
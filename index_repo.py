@@ -1,33 +1,32 @@
 import os
 import json
+import argparse
+import time
+from datetime import datetime
 from pathlib import Path
-import faiss
-from sentence_transformers import SentenceTransformer
+
+from embeddings import load_bucketed_encoder
+from embedding_cache import EmbeddingCache, chunk_hash, model_key
+from vector_store import build_index, save_index, INDEX_FILE
+from sharding import DOCS_FILE, DEFAULT_EXTENSIONS, DEFAULT_SKIP_DIRS, built_shards, index_root, shard_configs, shard_dir
 
 
 CONFIG_PATH = Path(__file__).parent / "config.json"  # configuring
 with open(CONFIG_PATH, "r", encoding="utf-8") as f:
     config = json.load(f)
 
-REPO_PATH = Path(config["repo_path"])
 CHUNK_SIZE = config["chunk_size"]
 CHUNK_OVERLAP = config["chunk_overlap"]
+INDEX_TYPE = config.get("index_type", "flat")
 
 
-OUT_DIR = Path(__file__).parent / "faiss_db"
-OUT_DIR.mkdir(exist_ok=True)
-INDEX_PATH = OUT_DIR / "repo.index"
-DOCS_PATH = OUT_DIR / "docs.json"
-
-
-ALLOWED_EXT = {".py"}
-SKIP_DIRS = {".venv", "env", "node_modules", "dist", "build", "__pycache__", "venv"}
-
-def iter_files(root: Path):
+def iter_files(root: Path, extensions=DEFAULT_EXTENSIONS, skip_dirs=DEFAULT_SKIP_DIRS):
+    extensions = set(extensions)
+    skip_dirs = set(skip_dirs)
     for dirpath, dirnames, filenames in os.walk(root):
-        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        dirnames[:] = [d for d in dirnames if d not in skip_dirs]
         for name in filenames:
-            if Path(name).suffix in ALLOWED_EXT:
+            if Path(name).suffix in extensions:
                 yield Path(dirpath) / name
 
 def chunk_text(text: str, chunk_size: int, overlap: int):
@@ -41,17 +40,18 @@ def chunk_text(text: str, chunk_size: int, overlap: int):
         start = end - overlap
 
 
-def index_repo():
-    print("Loading embedding model...")
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+def index_shard(shard: dict, model, out_dir: Path = None, cache: EmbeddingCache = None):
+    repo_path = Path(shard["repo_path"])
+    out_dir = out_dir or shard_dir(config, shard["name"])
+    out_dir.mkdir(parents=True, exist_ok=True)
 
-    docs = []
-    texts = []  # chunk texts for embedding
+    docs_by_hash = {}  # identical chunks share one vector; extra locations go to "dups"
+    chunk_count = 0
 
-    print(f"Scanning repo at {REPO_PATH} ...")
+    print(f"[{shard['name']}] Scanning {repo_path} for {', '.join(shard['extensions'])} ...")
     file_count = 0
 
-    for file_path in iter_files(REPO_PATH):
+    for file_path in iter_files(repo_path, shard["extensions"], shard["skip_dirs"]):
         file_count += 1
         if file_count % 50 == 0:
             print(f"  Scanned {file_count} files...")
@@ -61,42 +61,106 @@ def index_repo():
         except UnicodeDecodeError:
             continue
 
+        rel_path = file_path.relative_to(repo_path).as_posix()
+        start, line = 0, 1
         for i, chunk in enumerate(chunk_text(content, CHUNK_SIZE, CHUNK_OVERLAP)):
-            docs.append({
-                "path": str(file_path),
-                "chunk_id": i,
+            chunk_start = i * (CHUNK_SIZE - CHUNK_OVERLAP)  # same stride as chunk_text
+            line += content.count("\n", start, chunk_start)  # incremental, chunks only move forward
+            start = chunk_start
+            chunk_count += 1
+
+            location = {"path": str(file_path), "rel_path": rel_path, "chunk_id": i, "start": start, "start_line": line}
+            h = chunk_hash(chunk)
+            if h in docs_by_hash:
+                docs_by_hash[h].setdefault("dups", []).append(location)
+                continue
+            docs_by_hash[h] = {
+                "repo": shard["name"],
+                **location,
+                "hash": h,
                 "text": chunk
-            })
-            texts.append(chunk)
+            }
 
+    docs = list(docs_by_hash.values())
     if not docs:
-        print("No documents found to index.")
+        print(f"[{shard['name']}] No documents found to index.")
         return
 
-    print(f"Total prepared chunks: {len(docs)}. Computing embeddings (can be slow on CPU)...")
+    print(f"[{shard['name']}] Total prepared chunks: {chunk_count}, unique: {len(docs)}. "
+          f"Computing embeddings (can be slow on CPU)...")
 
-    emb = model.encode(  # embeddings computing
-        texts,
-        batch_size=32,
-        show_progress_bar=True,
-        convert_to_numpy=True,
-        normalize_embeddings=True,
-    ).astype("float32")
+    texts = [d["text"] for d in docs]  # chunk texts for embedding
+    start = time.perf_counter()
+    if cache is not None:  # unchanged chunks are never re-embedded
+        emb = cache.encode(model, texts, [d["hash"] for d in docs], show_progress_bar=True)
+        cache.save()
+    else:
+        emb = model.encode(texts, show_progress_bar=True)  # embeddings computing
+    elapsed = time.perf_counter() - start
+    print(f"Embedded {len(texts)} chunks in {elapsed:.1f}s ({len(texts) / max(elapsed, 1e-9):.1f} chunks/s)")
 
     dim = emb.shape[1]
     print(f"Embedding dim: {dim}")
 
-    index = faiss.IndexFlatIP(dim)
-    index.add(emb)
+    print(f"Building '{INDEX_TYPE}' index...")
+    index, rescore = build_index(emb, INDEX_TYPE)
 
     print("Saving FAISS index and docs mapping...")
-    faiss.write_index(index, str(INDEX_PATH))
-
-    with open(DOCS_PATH, "w", encoding="utf-8") as f:
+    save_index(out_dir, index, rescore, {
+        "name": shard["name"],
+        "repo_path": str(repo_path),
+        "extensions": list(shard["extensions"]),
+        "index_type": INDEX_TYPE,
+        "dim": dim,
+        "count": len(docs),
+        "chunks": chunk_count,
+        "embed_model": config.get("embed_model"),
+        "embed_backend": config.get("embed_backend", "torch"),
+        "built_at": datetime.now().isoformat(),
+    })
+
+    with open(out_dir / DOCS_FILE, "w", encoding="utf-8") as f:
         json.dump(docs, f, ensure_ascii=False)
 
-    print(f"Done. Saved:\n- {INDEX_PATH}\n- {DOCS_PATH}")
+    print(f"Done. Saved:\n- {out_dir / INDEX_FILE}\n- {out_dir / DOCS_FILE}")
+
+
+def referenced_hashes() -> set:  # every chunk hash in any built shard, including ones not rebuilt this run
+    hashes = set()
+    for _, directory in built_shards(config):
+        with open(directory / DOCS_FILE, "r", encoding="utf-8") as f:
+            hashes.update(d["hash"] for d in json.load(f) if "hash" in d)
+    return hashes
+
+
+def index_repo(shard_names=None):  # every configured shard, or only the named ones
+    shards = shard_configs(config)
+    if shard_names:
+        unknown = set(shard_names) - {s["name"] for s in shards}
+        if unknown:
+            print(f"Unknown shard(s): {', '.join(sorted(unknown))}")
+            return
+        shards = [s for s in shards if s["name"] in shard_names]
+
+    print("Loading embedding model...")
+    model = load_bucketed_encoder(config)  # length-sorted batches, sized and spread per embed_batch_size/embed_workers
+    cache = EmbeddingCache(index_root(config) / "embedding_cache", model_key(config))
+
+    try:
+        for shard in shards:
+            index_shard(shard, model, cache=cache)
+    finally:
+        model.close()
+    print(f"Embedding settings: {model.describe()}")
+
+    removed = cache.prune(referenced_hashes())
+    if removed:
+        print(f"Embedding cache: pruned {removed} vectors no shard uses any more")
 
 
 if __name__ == "__main__":
-    index_repo()
+    parser = argparse.ArgumentParser(description="Build FAISS index shards for the configured repositories")
+    parser.add_argument("--shard", action="append", help="rebuild only this shard (repeatable)")
+    args = parser.parse_args()
+
+    index_repo(args.shard)
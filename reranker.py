@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+import tracing
+
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def chunk_key(chunk: str, meta: dict):  # identifies a chunk version, so re-indexed text is scored again
+    return meta.get("repo"), meta.get("path"), meta.get("chunk_id"), hash(chunk)
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, batch_size: int = 16,
+                 budget_ms: float = 300, min_score: float = None, cache_size: int = 4096):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name)
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.min_score = min_score
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (query, chunk_key) -> score, LRU
+        self.pair_ms = None  # running estimate of the cost of scoring one pair, kept across calls
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            score = self.cache.get(key)
+            if score is not None:
+                self.cache.move_to_end(key)
+            return score
+
+    def _store(self, key, score: float):
+        with self._lock:
+            self.cache[key] = score
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _record(self, pairs: int, elapsed_ms: float):
+        per_pair = elapsed_ms / pairs
+        with self._lock:
+            self.pair_ms = per_pair if self.pair_ms is None else 0.7 * self.pair_ms + 0.3 * per_pair
+
+    def rerank(self, query: str, candidates: list, top_k: int):
+        # candidates come in first-stage order. Only as many as fit the latency budget are
+        # scored; the scored prefix is reranked and the rest keep their first-stage order
+        start = time.perf_counter()
+        keys = [(query, chunk_key(chunk, meta)) for chunk, meta in candidates]
+        scores = [self._cached(key) for key in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        tracing.count("rerank_cache.hit", len(scores) - len(missing))
+        tracing.count("rerank_cache.miss", len(missing))
+
+        if self.pair_ms:  # cap up front from what earlier calls cost
+            missing = missing[:max(1, int(self.budget_ms / self.pair_ms))]
+
+        for b in range(0, len(missing), self.batch_size):
+            batch = missing[b:b + self.batch_size]
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if b and elapsed_ms + len(batch) * self.pair_ms > self.budget_ms:
+                print(f"[rerank] Budget of {self.budget_ms:.0f} ms reached, reranking the first {missing[b]} candidates")
+                break
+
+            batch_start = time.perf_counter()
+            batch_scores = self.model.predict([(query, candidates[i][0]) for i in batch], batch_size=self.batch_size)
+            self._record(len(batch), (time.perf_counter() - batch_start) * 1000)
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self._store(keys[i], scores[i])
+
+        scored = next((i for i, s in enumerate(scores) if s is None), len(candidates))
+        order = sorted(range(scored), key=lambda i: scores[i], reverse=True)
+        results = []
+        for i in order[:top_k]:
+            if self.min_score is not None and scores[i] < self.min_score:
+                return results  # weak chunks only cost prompt tokens
+            chunk, meta = candidates[i]
+            results.append((chunk, {**meta, "first_stage_score": meta.get("score"), "score": scores[i]}))
+        return results + candidates[scored:scored + top_k - len(results)]  # unscored tail, first-stage order
+
+
+def load_reranker(config: dict):
+    if not config.get("use_reranker", False):
+        return None
+    return CrossEncoderReranker(
+        config.get("rerank_model", DEFAULT_RERANK_MODEL),
+        batch_size=int(config.get("rerank_batch_size", 16)),
+        budget_ms=float(config.get("rerank_budget_ms", 300)),
+        min_score=config.get("rerank_min_score"),
+    )
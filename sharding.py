@@ -0,0 +1,213 @@
+import contextvars
+import fnmatch
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+
+import tracing
+from embedding_cache import chunk_hash
+from vector_store import INDEX_FILE, VectorIndex
+
+
+DB_DIR = Path(__file__).parent / "faiss_db"
+DOCS_FILE = "docs.json"
+
+DEFAULT_EXTENSIONS = [".py"]
+DEFAULT_SKIP_DIRS = [".git", ".venv", "env", "node_modules", "dist", "build", "__pycache__", "venv"]
+
+MAX_CACHED_MASKS = 64
+
+_search_pool = None
+
+
+def shard_configs(config: dict) -> list:
+    # without a "shards" list the single repo_path is indexed as one shard called "default"
+    raw = config.get("shards") or [{"name": "default", "repo_path": config["repo_path"]}]
+
+    shards = []
+    for entry in raw:
+        shards.append({
+            "name": entry["name"],
+            "repo_path": entry["repo_path"],
+            "extensions": entry.get("extensions", config.get("extensions", DEFAULT_EXTENSIONS)),
+            "skip_dirs": entry.get("skip_dirs", config.get("skip_dirs", DEFAULT_SKIP_DIRS)),
+        })
+    return shards
+
+
+def index_root(config: dict) -> Path:  # "index_dir" lets benchmarks and tests build indexes elsewhere
+    return Path(config.get("index_dir", DB_DIR))
+
+
+def shard_dir(config: dict, name: str) -> Path:
+    return index_root(config) / "shards" / name
+
+
+def built_shards(config: dict) -> list:  # (name, directory) for every configured shard that has an index on disk
+    found = []
+    for shard in shard_configs(config):
+        directory = shard_dir(config, shard["name"])
+        if not (directory / INDEX_FILE).exists() and shard["name"] == "default":
+            directory = index_root(config)  # single-index layout from before shards existed
+        if (directory / INDEX_FILE).exists():
+            found.append((shard["name"], directory))
+    return found
+
+
+def has_index(config: dict) -> bool:
+    return bool(built_shards(config))
+
+
+def make_filter(path_prefix: str = None, file_glob: str = None, extensions=None):
+    # normalized, hashable form so per-shard id masks can be cached by it
+    if path_prefix:
+        path_prefix = path_prefix.replace("\\", "/")
+        if path_prefix.startswith("./"):
+            path_prefix = path_prefix[2:]
+        path_prefix = path_prefix.rstrip("/")  # matched per path component in matches_filter
+    if isinstance(extensions, str):
+        extensions = extensions.split(",")
+    if extensions:
+        extensions = tuple(sorted(e.strip() if e.strip().startswith(".") else f".{e.strip()}" for e in extensions if e.strip()))
+
+    if not (path_prefix or file_glob or extensions):
+        return None
+    return (path_prefix or None, file_glob or None, extensions or None)
+
+
+def doc_refs(item: dict) -> list:  # every location of a (deduplicated) chunk, primary first
+    return [item] + item.get("dups", [])
+
+
+def _under(path: str, prefix: str) -> bool:  # "services/billing" must not match "services/billing-legacy"
+    return path == prefix or path.startswith(prefix + "/")
+
+
+def matches_filter(item: dict, doc_filter) -> bool:  # item is a doc or one of its refs
+    path_prefix, file_glob, extensions = doc_filter
+    rel_path = item.get("rel_path", "")
+    path = item["path"].replace("\\", "/")
+
+    if path_prefix and not (_under(rel_path, path_prefix) or _under(path, path_prefix)):
+        return False
+    if file_glob and not (fnmatch.fnmatch(rel_path, file_glob) or fnmatch.fnmatch(path, file_glob)):
+        return False
+    if extensions and os.path.splitext(path)[1] not in extensions:
+        return False
+    return True
+
+
+class Shard:
+    def __init__(self, name: str, directory: Path, index: VectorIndex, docs: list):
+        self.name = name
+        self.directory = directory
+        self.index = index
+        self.docs = docs
+        self._masks = {}  # doc_filter -> bool array over faiss ids
+        self._masks_lock = threading.Lock()  # batch mode searches one shard from many threads
+
+    @classmethod
+    def load(cls, name: str, directory: Path, rescore_factor: int = 4):
+        index = VectorIndex.load(directory, rescore_factor=rescore_factor)
+        with open(directory / DOCS_FILE, "r", encoding="utf-8") as f:
+            docs = json.load(f)
+        return cls(name, directory, index, docs)
+
+    @property
+    def manifest(self) -> dict:
+        return self.index.manifest
+
+    def id_mask(self, doc_filter):
+        mask = self._masks.get(doc_filter)
+        tracing.count("filter_mask_cache.hit" if mask is not None else "filter_mask_cache.miss")
+        if mask is None:
+            mask = np.fromiter((any(matches_filter(r, doc_filter) for r in doc_refs(d)) for d in self.docs),
+                               dtype=bool, count=len(self.docs))
+            with self._masks_lock:
+                if len(self._masks) >= MAX_CACHED_MASKS:
+                    self._masks.pop(next(iter(self._masks)))
+                self._masks[doc_filter] = mask
+        return mask
+
+    def search(self, q_emb, top_k: int, doc_filter=None):
+        id_mask = None
+        if doc_filter:  # pushed into faiss so only matching chunks are scored
+            id_mask = self.id_mask(doc_filter)
+            if not id_mask.any():
+                return []
+
+        with tracing.span("faiss.search", shard=self.name, index_type=self.index.index_type, k=top_k,
+                          subset=int(id_mask.sum()) if id_mask is not None else self.index.ntotal):
+            scores, idxs = self.index.search(q_emb, top_k, id_mask=id_mask)
+
+        with tracing.span("docs.lookup", shard=self.name):
+            results = []
+            for i, score in zip(idxs[0].tolist(), scores[0].tolist()):
+                if i < 0 or i >= len(self.docs):
+                    continue
+                item = self.docs[i]
+                refs = doc_refs(item)
+                if doc_filter:  # report a location that actually matched the filter
+                    refs = [r for r in refs if matches_filter(r, doc_filter)]
+                results.append((item["text"], {
+                    "repo": self.name,
+                    "path": refs[0]["path"],
+                    "chunk_id": refs[0]["chunk_id"],
+                    "start": refs[0].get("start"),
+                    "start_line": refs[0].get("start_line"),
+                    "hash": item.get("hash"),
+                    "duplicates": [r["path"] for r in refs[1:]],
+                    "score": score,
+                }))
+        return results
+
+
+def load_shards(config: dict, rescore_factor: int = 4) -> list:
+    return [Shard.load(name, directory, rescore_factor) for name, directory in built_shards(config)]
+
+
+def search_shards(shards: list, q_emb, top_k: int, repo=None, path_prefix: str = None,
+                  file_glob: str = None, extensions=None):
+    global _search_pool
+
+    doc_filter = make_filter(path_prefix, file_glob, extensions)
+
+    if repo:
+        repos = {repo} if isinstance(repo, str) else set(repo)
+        shards = [s for s in shards if s.name in repos]
+    if not shards:
+        return []
+
+    if len(shards) == 1:
+        per_shard = [shards[0].search(q_emb, top_k, doc_filter)]
+    else:
+        if _search_pool is None:  # faiss releases the GIL, so threads search shards in parallel
+            _search_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="shard-search")
+        # each task gets its own copy of the context so trace spans nest under the caller's span
+        futures = [_search_pool.submit(contextvars.copy_context().run, s.search, q_emb, top_k, doc_filter)
+                   for s in shards]
+        per_shard = [f.result() for f in futures]
+
+    merged = sorted(chain.from_iterable(per_shard), key=lambda r: r[1]["score"], reverse=True)
+    return collapse_duplicates(merged)[:top_k]
+
+
+def collapse_duplicates(results: list) -> list:
+    # identical text from different shards (or from indexes built before dedup) is shown once,
+    # at its best score, with the other locations listed under "duplicates"
+    kept = {}
+    for chunk, meta in results:
+        key = meta.get("hash") or chunk_hash(chunk)
+        if key in kept:
+            first = kept[key][1]
+            seen = {first["path"], *first.get("duplicates", [])}
+            extra = [p for p in [meta["path"]] + meta.get("duplicates", []) if p not in seen]
+            first["duplicates"] = first.get("duplicates", []) + list(dict.fromkeys(extra))
+            continue
+        kept[key] = (chunk, dict(meta))
+    return list(kept.values())
@@ -1,11 +1,22 @@
+import time
+
+_START = time.perf_counter()  # for --profile-startup
+
+import argparse
+import importlib
 import json
 import re
 from pathlib import Path
 import datetime
-from ollama import chat
+import agent as retrieval
+import tracing
+from agent import chat  # lazy wrapper, ollama is imported on first call
 from tools.schemas import get_tools_for_ollama
 from tools.implementations import ToolExecutor
 from prompts import build_initial_prompt, build_reasoning_prompt
+from sharding import has_index
+
+_IMPORTS_DONE = time.perf_counter()
 
 
 class ToolUsingAgent:
@@ -13,6 +24,7 @@ class ToolUsingAgent:
         self.config_path = Path(config_path)
         with open(self.config_path, 'r', encoding='utf-8') as f:
             self.config = json.load(f)
+        tracing.configure(self.config)
 
         self.tool_executor = ToolExecutor(config_path)
 
@@ -31,7 +43,7 @@ class ToolUsingAgent:
         print(f"Tools: {', '.join(tool_names)}")
         print(f"Reasoning: {'Enabled' if use_reasoning else 'Disabled'}")
         print("Type 'exit' to quit, 'help' for commands\n")
-        print("Langtrace monitoring enabled")
+        print(f"Tracing: {tracing.describe()}")
 
     def _extract_tool_calls(self, text: str):
         if not text:
@@ -81,29 +93,37 @@ class ToolUsingAgent:
 
         print("Thinking about the best approach...")
 
-        reasoning_prompt = build_reasoning_prompt(query)
+        with tracing.span("reasoning") as s:
+            reasoning_prompt = build_reasoning_prompt(query)
 
-        reasoning_response = chat(
-            model=self.config.get("model_name", "gemma3:1b"),
-            messages=[
-                {"role": "system", "content": "You are a strategic thinker. Analyze requests and plan tool usage."},
-                {"role": "user", "content": reasoning_prompt}
-            ]
-        )
+            reasoning_response = chat(
+                model=self.config.get("model_name", "gemma3:1b"),
+                messages=[
+                    {"role": "system", "content": "You are a strategic thinker. Analyze requests and plan tool usage."},
+                    {"role": "user", "content": reasoning_prompt}
+                ]
+            )
 
-        reasoning = reasoning_response["message"]["content"]
+            reasoning = reasoning_response["message"]["content"]
+            s.set(reasoning_chars=len(reasoning))
         print(f"Reasoning: {reasoning[:200]}..." if len(reasoning) > 200 else f"Reasoning: {reasoning}")
 
         return reasoning
 
     def process_message(self, user_input: str) -> str:
+        with tracing.span("turn", entry="process_message", use_reasoning=self.use_reasoning):
+            return self._process_message(user_input)
+
+    def _process_message(self, user_input: str) -> str:
             reasoning = self._reason_about_query(user_input)
 
-            self.history.append({"role": "user", "content": user_input})  # user message to hisstory
+            with tracing.span("prompt.build") as s:
+                self.history.append({"role": "user", "content": user_input})  # user message to hisstory
 
-            messages = self.history.copy()  # add reasoning if exists
-            if reasoning:
-                messages.insert(-1, {"role": "assistant", "content": f"Thought: {reasoning}"})
+                messages = self.history.copy()  # add reasoning if exists
+                if reasoning:
+                    messages.insert(-1, {"role": "assistant", "content": f"Thought: {reasoning}"})
+                s.set(messages=len(messages), prompt_chars=sum(len(str(m.get("content", ""))) for m in messages))
 
             print("Generating response...")
 
@@ -181,7 +201,9 @@ class ToolUsingAgent:
             print(f"\n[{i}] Tool: {tool_name}")
             print(f"    Arguments: {json.dumps(arguments, indent=2)}")
 
-            tool_result = self.tool_executor.execute_tool(tool_name, arguments)
+            with tracing.span("tool.execute", tool=tool_name) as s:
+                tool_result = self.tool_executor.execute_tool(tool_name, arguments)
+                s.set(result_chars=len(tool_result), failed=tool_result.startswith("ERROR"))
 
             all_tool_results.append({
                 "tool": tool_name,
@@ -273,15 +295,59 @@ class ToolUsingAgent:
         print(help_text)
 
 
+def profile_startup(timings):  # time the deferred loads synchronously so they can be attributed
+    encoder_lib = "onnxruntime" if retrieval.config.get("embed_backend", "torch") == "onnx" else "sentence_transformers"
+    steps = [
+        ("import ollama", lambda: importlib.import_module("ollama")),
+        ("import faiss", lambda: importlib.import_module("faiss")),
+        (f"import {encoder_lib}", lambda: importlib.import_module(encoder_lib)),
+        ("load index shards", retrieval.load_shards),
+        ("load embedding model", retrieval.load_embed_model),
+        ("load reranker", retrieval.load_reranker),
+    ]
+
+    deferred = []
+    for label, step in steps:
+        start = time.perf_counter()
+        step()
+        deferred.append((label, time.perf_counter() - start))
+
+    print("\nStartup profile (until the prompt appears):")
+    for label, seconds in timings:
+        print(f"  {label:<28}{seconds * 1000:9.1f} ms")
+    print(f"  {'total':<28}{sum(s for _, s in timings) * 1000:9.1f} ms")
+
+    print("Deferred to background warm-up / first search:")
+    for label, seconds in deferred:
+        print(f"  {label:<28}{seconds * 1000:9.1f} ms")
+    print(f"  {'total':<28}{sum(s for _, s in deferred) * 1000:9.1f} ms\n")
+    print("(run with `python -X importtime` for a per-module import tree)\n")
+
+
 def main():
-    db_dir = Path(__file__).parent / "faiss_db"
-    if not (db_dir / "repo.index").exists():
+    parser = argparse.ArgumentParser(description="Tool-using coding agent")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print an import/load time breakdown before the prompt")
+    args = parser.parse_args()
+
+    if not has_index(retrieval.config):
         print("Warning: No FAISS index found.")
         print("Please run: python index_repo.py")
         return
 
     print("Initializing Agent...")
+    init_start = time.perf_counter()
     agent = ToolUsingAgent(use_reasoning=True)
+    init_done = time.perf_counter()
+
+    if args.profile_startup:
+        profile_startup([
+            ("module imports", _IMPORTS_DONE - _START),
+            ("agent init", init_done - init_start),
+        ])
+    else:
+        retrieval.warm_up_in_background()  # faiss/encoder load while the user types
+
     agent.chat_loop()
 
 
@@ -0,0 +1,57 @@
+import os
+import threading
+
+import tracing
+
+
+class DirectorySnapshot:  # one os.scandir pass per directory, entry names reused until the directory's mtime changes
+    def __init__(self, skip_dirs=()):
+        self.skip_dirs = set(skip_dirs)
+        self._entries = {}  # normalized path -> (mtime_ns, dirs, files)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path) -> str:
+        return os.path.normcase(os.path.normpath(str(path)))
+
+    def scan(self, path):  # (sorted dir names, sorted [(file name, size)])
+        key = self._key(path)
+        mtime_ns = os.stat(key).st_mtime_ns
+
+        cached = self._entries.get(key)
+        if cached and cached[0] == mtime_ns:
+            tracing.count("dir_cache.hit")
+            return cached[1], self._fresh_sizes(key, cached[2])
+        tracing.count("dir_cache.miss")
+
+        dirs, files = [], []
+        with os.scandir(key) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in self.skip_dirs:
+                            dirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append((entry.name, entry.stat().st_size))
+                except OSError:  # vanished or unreadable while scanning
+                    continue
+
+        dirs.sort()
+        files.sort()
+        with self._lock:
+            self._entries[key] = (mtime_ns, dirs, files)
+        return dirs, files
+
+    @staticmethod
+    def _fresh_sizes(key: str, files: list) -> list:  # edits outside modify_file change sizes, not the dir mtime
+        fresh = []
+        for name, _ in files:
+            try:
+                fresh.append((name, os.stat(os.path.join(key, name)).st_size))
+            except OSError:
+                continue
+        return fresh
+
+    def invalidate(self, path):  # file sizes change without touching the directory mtime
+        with self._lock:
+            self._entries.pop(self._key(path), None)
@@ -1,12 +1,13 @@
+import fnmatch
 import json
 import shutil
 from pathlib import Path
 from datetime import datetime
-import faiss
-from sentence_transformers import SentenceTransformer
-
 
 from agent import retrieve_chunks
+from context_packer import block_header, pack_context
+from sharding import DEFAULT_SKIP_DIRS, has_index
+from tools.dir_snapshot import DirectorySnapshot
 
 from memory import ConversationMemory
 
@@ -18,32 +19,21 @@ class ToolExecutor:
             self.config = json.load(f)
         MODEL_NAME = self.config["model_name"]
         self.top_k = int(self.config["top_k"])
-        self.db_dir = Path(__file__).parent.parent / "faiss_db"
-        self.index_path = self.db_dir / "repo.index"
-        self.docs_path = self.db_dir / "docs.json"
-
-        if self.index_path.exists():
-            self.index = faiss.read_index(str(self.index_path))
-        else:
-            self.index = None
-
-        if self.docs_path.exists():
-            with open(self.docs_path, 'r', encoding='utf-8') as f:
-                self.docs = json.load(f)
-        else:
-            self.docs = []
-
-        self.embed_model = SentenceTransformer(r"C:\all-MiniLM-L6-v2")
+        self.context_token_budget = int(self.config.get("context_token_budget", 2000))
+        self.chunk_stride = int(self.config["chunk_size"]) - int(self.config["chunk_overlap"])
 
         self.change_history = []  # Tracking changes
+        self.dir_snapshot = DirectorySnapshot(self.config.get("skip_dirs", DEFAULT_SKIP_DIRS))
         self.memory = memory or ConversationMemory()
 
-    def search_codebase(self, query: str, top_k) -> str:
-        if not self.index:
+    def search_codebase(self, query: str, top_k: int = None, repo: str = None, path_prefix: str = None,
+                        file_glob: str = None, extensions: str = None) -> str:
+        if not has_index(self.config):
             return "ERROR: No index found. Please run index_repo.py first."
 
         print(f"[Tool] Searching for: '{query}'")
-        chunks = retrieve_chunks(query, top_k)
+        chunks = retrieve_chunks(query, int(top_k or self.top_k), repo=repo, path_prefix=path_prefix,
+                                 file_glob=file_glob, extensions=extensions)
 
         if not chunks:
             return "No results found."
@@ -52,13 +42,19 @@ class ToolExecutor:
             contextual_query = f"{query}. Previous context: {self.memory.context_summary}"
             print(f"[Tool] Contextual search: {contextual_query[:100]}...")
 
+        blocks = pack_context(chunks, self.context_token_budget, self.chunk_stride)  # merged, within budget
+
         results = []
-        for i, (chunk, meta) in enumerate(chunks, 1):
+        for i, block in enumerate(blocks, 1):
             results.append(f"\n--- Result {i} ---")
-            results.append(f"File: {meta['path']}")
-            if 'score' in meta:
-                results.append(f"Relevance: {meta['score']:.3f}")
-            results.append(f"\n{chunk[:500]}..." if len(chunk) > 500 else f"\n{chunk}")
+            if block.get('repo'):
+                results.append(f"Repo: {block['repo']}")
+            results.append(block_header(block))
+            dups = block['duplicates']
+            if dups:
+                results.append(f"Also in: {', '.join(dups[:5])}" + (f" (+{len(dups) - 5} more)" if len(dups) > 5 else ""))
+            results.append(f"Relevance: {block['score']:.3f}")
+            results.append(f"\n{block['text']}")
 
         return "\n".join(results)
 
@@ -139,6 +135,7 @@ class ToolExecutor:
 
             with open(path, 'w', encoding='utf-8') as f:
                 f.writelines(lines)  # do changes
+            self.dir_snapshot.invalidate(path.parent)  # size changed, directory mtime may not have
 
             self.change_history.append({  # addidng changes
                 "timestamp": datetime.now().isoformat(),
@@ -153,28 +150,40 @@ class ToolExecutor:
         except Exception as e:
             return f"ERROR modifying file: {str(e)}"
 
-    def list_files(self, directory_path: str = ".") -> str:  # list files and directories
+    def list_files(self, directory_path: str = ".", recursive: bool = False, max_depth: int = 3,
+                   pattern: str = None, max_entries: int = 200) -> str:  # list files and directories
         try:
             base_path = Path(self.config["repo_path"])
             target_path = base_path / directory_path
 
-            if not target_path.exists():
+            if not target_path.is_dir():
                 return f"ERROR: Directory not found: {directory_path}"
 
             results = [f"Directory: {target_path}"]
 
-            dirs = [d for d in target_path.iterdir() if d.is_dir()]
+            if isinstance(recursive, str):  # models sometimes send "true"
+                recursive = recursive.strip().lower() == "true"
+            if recursive:  # whole subtree in one call instead of one call per level
+                lines = self._tree_lines(target_path, "", 0, max(1, int(max_depth)), pattern)
+                max_entries = max(1, int(max_entries))
+                results.extend(lines[:max_entries])
+                if len(lines) > max_entries:
+                    results.append(f"\n... and {len(lines) - max_entries} more entries (narrow with pattern or max_depth)")
+                return "\n".join(results)
+
+            dirs, files = self.dir_snapshot.scan(target_path)
+            if pattern:
+                files = [(name, size) for name, size in files if fnmatch.fnmatch(name, pattern)]
+
             if dirs:
                 results.append("\n Directories:")
-                for d in sorted(dirs)[:20]:  # Limit to 20
-                    results.append(f"  {d.name}/")
+                for d in dirs[:20]:  # Limit to 20
+                    results.append(f"  {d}/")
 
-            files = [f for f in target_path.iterdir() if f.is_file()]
             if files:
                 results.append("\n📄 Files:")
-                for f in sorted(files)[:30]:  # Limit to 30
-                    size = f.stat().st_size
-                    results.append(f"  {f.name} ({size} bytes)")
+                for name, size in files[:30]:  # Limit to 30
+                    results.append(f"  {name} ({size} bytes)")
 
             if len(dirs) > 20 or len(files) > 30:
                 results.append(f"\n... and {max(0, len(dirs) - 20) + max(0, len(files) - 30)} more items")
@@ -184,6 +193,27 @@ class ToolExecutor:
         except Exception as e:
             return f"ERROR listing files: {str(e)}"
 
+    def _tree_lines(self, path: Path, rel: str, depth: int, max_depth: int, pattern: str = None) -> list:
+        dirs, files = self.dir_snapshot.scan(path)
+        indent = "  " * depth
+        lines = []
+
+        for d in dirs:
+            if depth + 1 < max_depth:
+                sub = self._tree_lines(path / d, f"{rel}{d}/", depth + 1, max_depth, pattern)
+                if sub or not pattern:  # with a pattern, only show directories that contain matches
+                    lines.append(f"{indent}{d}/")
+                    lines.extend(sub)
+            else:
+                lines.append(f"{indent}{d}/ ...")  # depth limit reached, matches may be further down
+
+        for name, size in files:
+            if pattern and not (fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel + name, pattern)):
+                continue
+            lines.append(f"{indent}{name} ({size} bytes)")
+
+        return lines
+
     def execute_tool(self, tool_name: str, arguments: dict) -> str:
         if tool_name == "search_codebase":
             return self.search_codebase(**arguments)
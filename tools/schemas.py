@@ -11,6 +11,26 @@ TOOL_SCHEMAS = [
                 "type": "integer",
                 "description": "Number of results to return (default: 5)",
                 "default": 5
+            },
+            "repo": {
+                "type": "string",
+                "description": "Only search this indexed repository/shard (e.g. 'billing')",
+                "optional": True
+            },
+            "path_prefix": {
+                "type": "string",
+                "description": "Only return code under this path (e.g. 'services/billing')",
+                "optional": True
+            },
+            "file_glob": {
+                "type": "string",
+                "description": "Only return files matching this glob (e.g. '*/handlers/*.py')",
+                "optional": True
+            },
+            "extensions": {
+                "type": "string",
+                "description": "Comma-separated file extensions to search (e.g. '.py,.ts')",
+                "optional": True
             }
         }
     },
@@ -53,12 +73,32 @@ TOOL_SCHEMAS = [
     },
     {
         "name": "list_files",
-        "description": "List files in a directory. Use this to explore the project structure.",
+        "description": "List files in a directory. Use recursive=true to see a whole subtree in one call when exploring the project structure.",
         "parameters": {
             "directory_path": {
                 "type": "string",
                 "description": "Directory to list (default: project root)",
                 "default": "."
+            },
+            "recursive": {
+                "type": "boolean",
+                "description": "Show the whole subtree as an indented tree instead of one level (default: false)",
+                "default": False
+            },
+            "max_depth": {
+                "type": "integer",
+                "description": "How many levels deep a recursive listing goes (default: 3)",
+                "default": 3
+            },
+            "pattern": {
+                "type": "string",
+                "description": "Only show files matching this glob (e.g. '*.py', 'tests/*')",
+                "optional": True
+            },
+            "max_entries": {
+                "type": "integer",
+                "description": "Maximum lines in a recursive listing (default: 200)",
+                "default": 200
             }
         }
     }
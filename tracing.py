@@ -0,0 +1,210 @@
+import argparse
+import contextvars
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+
+TRACING_MODES = {"off", "jsonl", "otel"}
+DEFAULT_TRACE_FILE = "./traces/agent_traces.jsonl"  # relative paths are under the repo root, like faiss_db
+ROOT_DIR = Path(__file__).parent
+
+_mode = "off"
+_settings = None  # what configure() was last called with
+_trace_file = None
+_trace_fh = None
+_otel_provider = None
+_otel_tracer = None
+_write_lock = threading.Lock()
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, parent=None, attributes: dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.root = parent.root if parent else self
+        self.attributes = dict(attributes or {})
+        self.counters = defaultdict(int)  # only used on root spans, see count()
+        self.start = time.time()
+        self.duration_ms = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        return self
+
+
+_NOOP = _NoopSpan()
+
+
+def trace_path(path) -> Path:
+    path = Path(path)
+    return path if path.is_absolute() else ROOT_DIR / path
+
+
+def configure(config: dict):  # safe to call repeatedly, e.g. once per ToolUsingAgent
+    global _mode, _settings, _trace_file, _trace_fh, _otel_provider, _otel_tracer
+
+    mode = config.get("tracing", "off")
+    if mode not in TRACING_MODES:
+        raise ValueError(f"Unknown tracing mode '{mode}', expected one of {sorted(TRACING_MODES)}")
+
+    settings = (mode, trace_path(config.get("trace_file", DEFAULT_TRACE_FILE)), config.get("otel_endpoint"))
+    with _write_lock:
+        if settings == _settings:
+            return
+
+        if _trace_fh is not None:
+            _trace_fh.close()
+        if _otel_provider is not None:
+            _otel_provider.shutdown()  # flushes spans still queued in the batch processor
+        _trace_fh = _otel_provider = _otel_tracer = None
+
+        if mode == "otel":  # pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+            # our own provider rather than the global one, which OpenTelemetry lets us set only once
+            _otel_provider = TracerProvider(resource=Resource.create({"service.name": "repo-agent"}))
+            _otel_provider.add_span_processor(
+                BatchSpanProcessor(OTLPSpanExporter(endpoint=config.get("otel_endpoint"))))
+            _otel_tracer = _otel_provider.get_tracer("repo-agent")
+
+        _mode, _settings, _trace_file = mode, settings, settings[1]
+
+
+def enabled() -> bool:
+    return _mode != "off"
+
+
+def describe() -> str:
+    if _mode == "jsonl":
+        return f"JSONL -> {_trace_file}"
+    if _mode == "otel":
+        return "OpenTelemetry (OTLP)"
+    return "off"
+
+
+@contextmanager
+def span(name: str, **attributes):
+    if _mode == "off":
+        yield _NOOP
+        return
+
+    parent = _current.get()
+    current = Span(name, parent, attributes)
+    token = _current.set(current)
+    started = time.perf_counter()
+
+    with (_otel_tracer.start_as_current_span(name) if _otel_tracer else nullcontext()) as otel_span:
+        try:
+            yield current
+        except BaseException as e:
+            current.status = "error"
+            current.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current.duration_ms = (time.perf_counter() - started) * 1000
+            _current.reset(token)
+            if current is current.root:
+                current.attributes.update(_counter_attributes(current.counters))
+            if otel_span is not None:
+                otel_span.set_attributes({k: v for k, v in current.attributes.items()
+                                          if isinstance(v, (str, bool, int, float))})
+            if _mode == "jsonl":
+                _write(current)
+
+
+def count(name: str, n: int = 1):  # aggregated on the turn's root span, e.g. count("rerank_cache.hit")
+    current = _current.get()
+    if current is not None:
+        current.root.counters[name] += n
+
+
+def _counter_attributes(counters: dict) -> dict:
+    attributes = {f"count.{k}": v for k, v in counters.items()}
+    for key in counters:
+        if key.endswith(".hit"):
+            prefix = key[:-len(".hit")]
+            total = counters[key] + counters.get(f"{prefix}.miss", 0)
+            attributes[f"{prefix}.hit_rate"] = round(counters[key] / total, 4) if total else None
+    return attributes
+
+
+def _write(current: Span):
+    global _trace_fh
+
+    record = {
+        "trace_id": current.trace_id,
+        "span_id": current.span_id,
+        "parent_id": current.parent_id,
+        "name": current.name,
+        "start": current.start,
+        "duration_ms": round(current.duration_ms, 3),
+        "status": current.status,
+        "attributes": current.attributes,
+    }
+    if current.error:
+        record["error"] = current.error
+
+    line = json.dumps(record, default=str) + "\n"
+    with _write_lock:
+        if _trace_fh is None:
+            _trace_file.parent.mkdir(parents=True, exist_ok=True)
+            _trace_fh = open(_trace_file, "a", encoding="utf-8")
+        _trace_fh.write(line)
+        _trace_fh.flush()
+
+
+def token_usage(response) -> dict:  # ollama reports prompt/completion tokens on the final response
+    usage = {}
+    for field, key in (("prompt_eval_count", "prompt_tokens"), ("eval_count", "completion_tokens")):
+        try:
+            value = response[field]
+        except (KeyError, TypeError):
+            value = None
+        if value is not None:
+            usage[key] = value
+    return usage
+
+
+def summarize(path: Path):  # where does turn latency go?
+    durations = defaultdict(list)
+    turn_total = 0.0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            durations[record["name"]].append(record["duration_ms"])
+            if record["parent_id"] is None:
+                turn_total += record["duration_ms"]
+
+    print(f"{'span':<24}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'total ms':>12}{'% of turns':>12}")
+    for name, values in sorted(durations.items(), key=lambda kv: -sum(kv[1])):
+        values.sort()
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        share = sum(values) / turn_total * 100 if turn_total else 0
+        print(f"{name:<24}{len(values):>7}{statistics.median(values):>11.1f}{p95:>11.1f}"
+              f"{sum(values):>12.1f}{share:>11.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a JSONL trace file by span name")
+    parser.add_argument("trace_file", type=Path, nargs="?", default=trace_path(os.environ.get("TRACE_FILE", DEFAULT_TRACE_FILE)))
+    summarize(parser.parse_args().trace_file)
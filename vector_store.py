@@ -0,0 +1,152 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+# faiss is imported inside the functions that need it so that importing this module
+# (e.g. for INDEX_FILE) stays cheap
+
+
+INDEX_TYPES = {"flat", "sq8", "binary"}
+INDEX_FILE = "repo.index"
+RESCORE_FILE = "rescore.npy"
+MANIFEST_FILE = "manifest.json"
+SUBSET_RESCORE_MAX = 10_000  # filtered binary searches rescore a subset this small directly
+RESCORE_BLOCK = 8192  # rows converted to float32 at a time when rescoring
+
+
+def build_index(emb: np.ndarray, index_type: str = "flat"):
+    import faiss
+
+    dim = emb.shape[1]
+
+    if index_type == "flat":  # float32, exact
+        index = faiss.IndexFlatIP(dim)
+        index.add(emb)
+        return index, None
+
+    if index_type == "sq8":  # 1 byte per dimension
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(emb)
+        index.add(emb)
+        return index, None
+
+    if index_type == "binary":  # 1 bit per dimension, candidates are rescored with int8 vectors
+        if dim % 8:
+            raise ValueError(f"Binary index needs a dimension divisible by 8, got {dim}")
+        index = faiss.IndexBinaryFlat(dim)
+        index.add(np.packbits(emb > 0, axis=1))
+        rescore = np.clip(np.round(emb * 127), -127, 127).astype("int8")
+        return index, rescore
+
+    raise ValueError(f"Unknown index_type '{index_type}', expected one of {sorted(INDEX_TYPES)}")
+
+
+def save_index(out_dir: Path, index, rescore, manifest: dict):
+    import faiss
+
+    out_dir = Path(out_dir)
+    rescore_path = out_dir / RESCORE_FILE
+
+    if manifest.get("index_type") == "binary":
+        faiss.write_index_binary(index, str(out_dir / INDEX_FILE))
+        np.save(rescore_path, rescore)
+    else:
+        faiss.write_index(index, str(out_dir / INDEX_FILE))
+        if rescore_path.exists():  # left over from a previous binary build
+            rescore_path.unlink()
+
+    with open(out_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_manifest(db_dir: Path) -> dict:
+    manifest_path = Path(db_dir) / MANIFEST_FILE
+    if not manifest_path.exists():  # indexes built before manifests existed are plain IndexFlatIP
+        return {"index_type": "flat"}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class VectorIndex:
+    def __init__(self, index, index_type: str = "flat", rescore=None, rescore_factor: int = 4, manifest: dict = None):
+        self.index = index
+        self.index_type = index_type
+        self.rescore = rescore
+        self.rescore_factor = max(1, rescore_factor)
+        self.manifest = manifest or {"index_type": index_type}
+
+    @classmethod
+    def load(cls, db_dir: Path, rescore_factor: int = 4):
+        import faiss
+
+        db_dir = Path(db_dir)
+        manifest = load_manifest(db_dir)
+        index_type = manifest.get("index_type", "flat")
+
+        if index_type == "binary":
+            index = faiss.read_index_binary(str(db_dir / INDEX_FILE))
+            rescore = np.load(db_dir / RESCORE_FILE, mmap_mode="r")
+        else:
+            index = faiss.read_index(str(db_dir / INDEX_FILE))
+            rescore = None
+
+        return cls(index, index_type, rescore, rescore_factor, manifest)
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def search(self, q_emb: np.ndarray, top_k: int, id_mask: np.ndarray = None):  # same (scores, ids) shape as faiss
+        q_emb = np.asarray(q_emb, dtype="float32")
+
+        if id_mask is not None:  # only ids where id_mask is True are scored at all
+            if self.index_type == "binary":  # IndexBinaryFlat ignores selectors
+                return self._search_binary_filtered(q_emb, top_k, id_mask)
+
+            import faiss
+
+            bitmap = np.packbits(id_mask, bitorder="little")  # must stay referenced while faiss reads it
+            selector = faiss.IDSelectorBitmap(len(id_mask), faiss.swig_ptr(bitmap))
+            return self.index.search(q_emb, top_k, params=faiss.SearchParameters(sel=selector))
+
+        if self.index_type != "binary":
+            return self.index.search(q_emb, top_k)
+
+        n_candidates = min(self.index.ntotal, top_k * self.rescore_factor)
+        _, candidates = self.index.search(np.packbits(q_emb > 0, axis=1), n_candidates)
+        return self._rescore(q_emb, candidates, top_k)
+
+    def _search_binary_filtered(self, q_emb: np.ndarray, top_k: int, id_mask: np.ndarray):
+        subset = np.flatnonzero(id_mask)
+        if len(subset) <= SUBSET_RESCORE_MAX:  # narrow filter, cheaper to score every match
+            return self._rescore(q_emb, [subset] * len(q_emb), top_k)
+
+        # broad filter: Hamming over-fetch sized by the match rate, grown until each query has enough matches
+        want = min(len(subset), top_k * self.rescore_factor)
+        fetch = min(self.index.ntotal, int(np.ceil(want * self.index.ntotal / len(subset))) * 2)
+        q_bits = np.packbits(q_emb > 0, axis=1)
+        while True:
+            _, found = self.index.search(q_bits, fetch)
+            candidates = []
+            for cand in found:
+                cand = cand[cand >= 0]
+                candidates.append(cand[id_mask[cand]][:want])
+            if fetch >= self.index.ntotal or min(len(c) for c in candidates) >= want:
+                return self._rescore(q_emb, candidates, top_k)
+            fetch = min(self.index.ntotal, fetch * 2)
+
+    def _rescore(self, q_emb: np.ndarray, candidates, top_k: int):  # exact-ish scores from the int8 copy
+        scores = np.full((len(q_emb), top_k), -np.inf, dtype="float32")
+        ids = np.full((len(q_emb), top_k), -1, dtype="int64")
+        for row, (q, cand) in enumerate(zip(q_emb, candidates)):
+            cand = cand[cand >= 0]
+            cand_scores = np.empty(len(cand), dtype="float32")
+            for start in range(0, len(cand), RESCORE_BLOCK):  # never a float32 copy of the whole candidate set
+                block = cand[start:start + RESCORE_BLOCK]
+                cand_scores[start:start + len(block)] = (np.asarray(self.rescore[block], dtype="float32") @ q) / 127.0
+            order = np.argsort(-cand_scores)[:top_k]
+            scores[row, :len(order)] = cand_scores[order]
+            ids[row, :len(order)] = cand[order]
+
+        return scores, ids